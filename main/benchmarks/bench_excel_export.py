@@ -0,0 +1,70 @@
+"""
+Бенчмарк потоковой записи Excel (ExcelReportWriter): время и пиковый RSS на 10k / 100k / 1M строк.
+Каждый размер считается в отдельном процессе, чтобы пик памяти одного прогона не влиял на другой.
+Строки синтетические, порциями как из ReportRepository.stream_doctor_export (без базы).
+
+Запуск из папки main:
+    python -m benchmarks.bench_excel_export --rows 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from infrastructure.database.repo.report_repo import EXPORT_CHUNK_SIZE
+from utils.report.excel_generator import create_excel_report_from_stream
+
+
+async def doctor_chunks(rows: int):
+    now = datetime.now()
+    for start in range(0, rows, EXPORT_CHUNK_SIZE):
+        yield [
+            (i, now, "rep_1", "Алмалинский", 3, "Городская поликлиника №5", f"Иванов Иван Иванович {i}",
+             "Терапевт", None, "Предоплата", "Аспирин, Нурофен, Парацетамол", None if i % 3 else "Комментарий")
+            for i in range(start, min(rows, start + EXPORT_CHUNK_SIZE))
+        ]
+
+
+async def apothecary_chunks(rows: int):
+    now = datetime.now()
+    for start in range(0, rows, EXPORT_CHUNK_SIZE):
+        yield [
+            (i, now, "rep_1", "Алмалинский", 3, "Аптека №12", "Аспирин", i % 7, i % 5, None)
+            for i in range(start, min(rows, start + EXPORT_CHUNK_SIZE))
+        ]
+
+
+def run_child(rows: int):
+    started = time.perf_counter()
+    # 80% строк — врачи, 20% — аптеки
+    path, written = asyncio.run(create_excel_report_from_stream(
+        doctor_chunks(rows * 4 // 5), apothecary_chunks(rows - rows * 4 // 5)
+    ))
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(path) / 2 ** 20
+    os.remove(path)
+
+    # ru_maxrss в Linux — килобайты
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{written:>9} rows: {elapsed:8.1f} s, peak RSS {peak_mb:7.1f} MB, file {size_mb:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child)
+
+    for rows in args.rows:
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_excel_export", "--child", str(rows)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Задержка event loop, пока собирается большая выгрузка: рендер прямо в loop (как было),
+в пуле потоков и в пуле процессов (render_pool). «Агент» — корутина, которая каждые 10 мс
+просыпается и меряет, насколько опоздала.
+
+Запуск из папки main:
+    python -m benchmarks.bench_export_loop_lag --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.bench_excel_export import doctor_chunks, apothecary_chunks
+from utils.report.excel_generator import ExcelReportWriter, render_workbook
+from utils.report.render_pool import RenderPool
+
+TICK = 0.01
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def spooled_writer(rows: int) -> ExcelReportWriter:
+    writer = ExcelReportWriter()
+    async for chunk in doctor_chunks(rows * 4 // 5):
+        writer.doctors.write(chunk)
+    async for chunk in apothecary_chunks(rows - rows * 4 // 5):
+        writer.apothecaries.write(chunk)
+    return writer
+
+
+async def measure(name: str, writer: ExcelReportWriter, render):
+    lags, stop = [], asyncio.Event()
+    task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 5)
+
+    path = writer.new_path()
+    started = time.perf_counter()
+    await render(writer.sheets, path)
+    elapsed = time.perf_counter() - started
+    os.remove(path)
+
+    stop.set()
+    await task
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1] if len(lags_ms) > 1 else lags_ms[-1]
+    print(
+        f"{name:<10} render {elapsed:6.1f} s | loop lag p50 {statistics.median(lags_ms):8.1f} ms, "
+        f"p99 {p99:8.1f} ms, max {lags_ms[-1]:8.1f} ms ({len(lags_ms)} ticks)"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    writer = await spooled_writer(args.rows)
+    threads = RenderPool(max_workers=1, use_processes=False)
+    processes = RenderPool(max_workers=1, use_processes=True)
+    try:
+        async def inline(sheets, path):
+            render_workbook(sheets, path)
+
+        await measure("inline", writer, inline)
+        await measure("thread", writer, lambda sheets, path: threads.run(render_workbook, sheets, path))
+        await measure("process", writer, lambda sheets, path: processes.run(render_workbook, sheets, path))
+        print(f"process pool kind: {processes.kind}")
+    finally:
+        threads.shutdown()
+        processes.shutdown()
+        writer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
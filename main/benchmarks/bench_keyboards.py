@@ -0,0 +1,100 @@
+"""
+Бенчмарк построения клавиатур: сколько стоит разметка на один апдейт,
+когда InlineKeyboardBuilder собирается заново и когда берется готовая из keyboard_cache.
+
+Запуск из папки main:
+    python -m benchmarks.bench_keyboards --calls 20000 --items 40
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import replace
+
+from infrastructure.cache.territory_index import territory_index
+from infrastructure.database.dto import DistrictRow, LpuRow
+from keyboard.inline import admin_kb, inline_buttons, menu_kb
+from keyboard.inline.keyboard_cache import keyboard_cache
+
+
+def fill_index(items: int):
+    """Один регион с items районами и один маршрут с items ЛПУ прямо в индексе (без базы)"""
+    for i in range(1, items + 1):
+        territory_index.add_lpu(LpuRow(i, 1, f"Городская поликлиника №{i}", None))
+    districts = tuple(DistrictRow(i, f"Район {i}", "АЛА") for i in range(1, items + 1))
+    territory_index._swap(replace(
+        territory_index.snapshot,
+        districts={d.id: d for d in districts},
+        districts_by_region={"АЛА": districts},
+    ))
+
+
+def report(name: str, started: float, calls: int):
+    per_call = (time.perf_counter() - started) / calls * 1e6
+    print(f"{name:<28} {per_call:9.2f} µs/update")
+
+
+def bench_static(calls: int):
+    for name, fn in (
+        ("admin_menu", admin_kb.get_admin_menu),
+        ("report_period", admin_kb.get_report_period_kb),
+        ("guest_menu", menu_kb.get_guest_menu_inline),
+        ("confirm", inline_buttons.get_confirm_inline),
+    ):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn.uncached()
+        report(f"{name}/built", started, calls)
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        report(f"{name}/cached", started, calls)
+
+
+async def bench_territory(calls: int):
+    districts = territory_index.get_districts_by_region("АЛА")
+    lpus = territory_index.get_lpus_by_road(1)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        await inline_buttons.get_district_inline(districts, None)
+    report(f"districts[{len(districts)}]/built", started, calls)
+
+    await inline_buttons.get_region_districts_inline("АЛА")  # Первая сборка
+    started = time.perf_counter()
+    for _ in range(calls):
+        await inline_buttons.get_region_districts_inline("АЛА")
+    report(f"districts[{len(districts)}]/cached", started, calls)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        await inline_buttons.get_lpu_inline(lpus, None)
+    report(f"lpus[{len(lpus)}]/built", started, calls)
+
+    await inline_buttons.get_road_lpus_inline(1)
+    started = time.perf_counter()
+    for _ in range(calls):
+        await inline_buttons.get_road_lpus_inline(1)
+    report(f"lpus[{len(lpus)}]/cached", started, calls)
+
+    # Изменение справочника: следующий вызов пересобирает разметку один раз
+    territory_index.add_lpu(LpuRow(10_000, 1, "Новая поликлиника", None))
+    started = time.perf_counter()
+    await inline_buttons.get_road_lpus_inline(1)
+    report("lpus/after change (1 call)", started, 1)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=40)
+    args = parser.parse_args()
+
+    fill_index(args.items)
+    bench_static(args.calls)
+    await bench_territory(max(args.calls // 10, 1))
+    print(f"keyboard cache: {keyboard_cache.stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
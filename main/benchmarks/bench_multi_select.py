@@ -0,0 +1,71 @@
+"""
+Бенчмарк клавиатуры мульти-выбора препаратов: полная пересборка на каждый тап
+(build_multi_select_keyboard) против готовых строк на версию справочника с заменой одной строки.
+
+Запуск из папки main:
+    python -m benchmarks.bench_multi_select --taps 20
+"""
+import argparse
+import random
+import time
+
+from infrastructure.cache.medication_catalog import CatalogSnapshot
+from keyboard.inline.inline_select import (
+    build_multi_select_keyboard, multi_select_cache, get_multi_select_keyboard, toggle_multi_select_keyboard
+)
+
+
+def make_catalog(version: int, size: int) -> CatalogSnapshot:
+    items = tuple((i, f"Препарат {i} таблетки покрытые оболочкой 10 мг") for i in range(1, size + 1))
+    return CatalogSnapshot(version=version, items=items, names=dict(items))
+
+
+def tap_sequence(size: int, taps: int) -> list:
+    rnd = random.Random(size)
+    return [rnd.randint(1, size) for _ in range(taps)]
+
+
+def bench(size: int, taps: int):
+    catalog = make_catalog(size, size)
+    sequence = tap_sequence(size, taps)
+
+    selected = []
+    started = time.perf_counter()
+    for option_id in sequence:
+        selected.remove(option_id) if option_id in selected else selected.append(option_id)
+        build_multi_select_keyboard(catalog.items, selected, "doc")
+    rebuilt = (time.perf_counter() - started) / taps * 1e3
+
+    # Холодный старт: первый показ собирает шаблон
+    started = time.perf_counter()
+    get_multi_select_keyboard(catalog, [], "doc")
+    first = (time.perf_counter() - started) * 1e3
+
+    selected = []
+    started = time.perf_counter()
+    for option_id in sequence:
+        before = tuple(selected)
+        selected.remove(option_id) if option_id in selected else selected.append(option_id)
+        markup = toggle_multi_select_keyboard(catalog, before, option_id, "doc")
+    flipped = (time.perf_counter() - started) / taps * 1e3
+
+    # Итог совпадает с полной пересборкой
+    expected = build_multi_select_keyboard(catalog.items, selected, "doc")
+    assert markup.model_dump() == expected.model_dump()
+
+    print(f"{size:>4} preps: rebuild {rebuilt:8.3f} ms/tap | template {first:8.3f} ms once, toggle {flipped:7.3f} ms/tap")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--taps", type=int, default=20)  # Полная пересборка 500 строк — секунды на тап
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 250, 500])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        bench(size, args.taps)
+    print(f"multi-select cache: {multi_select_cache.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк сохранения отчетов: коммит в каждом хэндлере vs write-behind очередь с групповым коммитом.
+
+Запуск из папки main:
+    python -m benchmarks.bench_report_queue --reps 100 --reports 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.migrations.migrator import upgrade_to_head
+from infrastructure.database.report_queue import ReportWriteQueue
+from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.sqlite_profile import SQLiteProfile, create_sqlite_engine
+
+
+def make_report(rep: int, n: int) -> dict:
+    return dict(
+        user=f"rep_{rep}", district="Район", road=1, lpu="ЛПУ",
+        doctor_name=f"Врач {n}", doctor_spec="Терапевт", doctor_number=None,
+        term="Условия", comment="", preps=[(1, "Препарат А"), (2, "Препарат Б")]
+    )
+
+
+async def _prepare():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", SQLiteProfile())
+    await upgrade_to_head(engine)
+    return engine, async_sessionmaker(engine, expire_on_commit=False), os.path.dirname(path)
+
+
+def _report(name: str, total: int, elapsed: float, acks: list):
+    p50 = statistics.median(acks)
+    p95 = statistics.quantiles(acks, n=20)[-1] if len(acks) >= 20 else p50
+    print(f"{name:<14} reports/s={total / elapsed:8.1f}  ack p50={p50:7.2f}ms p95={p95:7.2f}ms")
+
+
+async def bench_direct(reps: int, reports: int):
+    engine, factory, _ = await _prepare()
+    acks = []
+
+    async def handler(rep: int):
+        for n in range(reports):
+            started = time.perf_counter()
+            async with factory() as session:
+                await ReportRepository(session).add_doctor_report(**make_report(rep, n))
+                await session.commit()
+            acks.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(reps)))
+    _report("per-handler", reps * reports, time.perf_counter() - started, acks)
+    await engine.dispose()
+
+
+async def bench_queue(reps: int, reports: int, batch: int, delay: float):
+    engine, factory, workdir = await _prepare()
+    queue = ReportWriteQueue(factory, os.path.join(workdir, "spool.jsonl"), max_batch=batch, max_delay=delay)
+    await queue.start()
+    acks = []
+
+    async def handler(rep: int):
+        for n in range(reports):
+            started = time.perf_counter()
+            await queue.enqueue("doctor", make_report(rep, n))
+            acks.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(reps)))
+    await queue.stop()  # Время включает полную запись очереди в базу
+    _report(f"write-behind", reps * reports, time.perf_counter() - started, acks)
+    print(f"{'':<14} {queue.stats}")
+    await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reps", type=int, default=100)
+    parser.add_argument("--reports", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    await bench_direct(args.reps, args.reports)
+    await bench_queue(args.reps, args.reports, args.batch, args.delay)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
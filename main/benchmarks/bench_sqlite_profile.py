@@ -0,0 +1,93 @@
+"""
+Бенчмарк SQLite-профиля: пропускная способность записи отчетов и задержка чтения
+при конкурентных сессиях — с профилем (WAL и т.д.) и без него.
+
+Запуск из папки main:
+    python -m benchmarks.bench_sqlite_profile --writers 20 --reports 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.migrations.migrator import upgrade_to_head
+from infrastructure.database.sqlite_profile import SQLiteProfile, create_sqlite_engine
+
+
+INSERT_REPORT = text(
+    "INSERT INTO main_reports (user, district, road, lpu, doc_name, doc_spec, term, date) "
+    "VALUES (:user, 'Район', 1, 'ЛПУ', :doc, 'Терапевт', 'Условия', :date)"
+)
+SELECT_LAST = text(
+    "SELECT id FROM main_reports WHERE user = :user AND doc_name = :doc ORDER BY date DESC LIMIT 1"
+)
+
+
+async def _writer(factory, idx: int, reports: int, errors: list):
+    for n in range(reports):
+        try:
+            async with factory() as session:
+                await session.execute(INSERT_REPORT, {"user": f"rep_{idx}", "doc": f"doc_{n}", "date": datetime.now()})
+                await session.commit()
+        except Exception as e:
+            errors.append(e)
+
+
+async def _reader(factory, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with factory() as session:
+            await session.execute(SELECT_LAST, {"user": "rep_0", "doc": "doc_0"})
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0)
+
+
+async def run_case(name: str, profile: SQLiteProfile, writers: int, reports: int, readers: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", profile)
+    await upgrade_to_head(engine)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    errors, latencies = [], []
+    stop = asyncio.Event()
+    reader_tasks = [asyncio.create_task(_reader(factory, stop, latencies)) for _ in range(readers)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_writer(factory, i, reports, errors) for i in range(writers)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*reader_tasks)
+    await engine.dispose()
+
+    written = writers * reports - len(errors)
+    p50 = statistics.median(latencies) if latencies else 0
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else p50
+    print(
+        f"{name:<12} writes/s={written / elapsed:8.1f}  errors={len(errors):4d}  "
+        f"read p50={p50:6.2f}ms p95={p95:6.2f}ms  reads={len(latencies)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--reports", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    baseline = SQLiteProfile(enabled=False)
+    tuned = SQLiteProfile()
+
+    await run_case("default", baseline, args.writers, args.reports, args.readers)
+    await run_case("profile", tuned, args.writers, args.reports, args.readers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
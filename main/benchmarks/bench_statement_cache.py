@@ -0,0 +1,96 @@
+"""
+Микробенчмарк готовых выражений: накладные расходы на вызов, когда select() строится заново
+(как было в репозиториях) и когда берется готовое выражение с bindparam.
+Готовые выражения импортируются из репозиториев: врачи ЛПУ (pharmacy_repo) и профиль
+пользователя (user_repo) — чтения, которые бот выполняет сейчас.
+
+Запуск из папки main:
+    python -m benchmarks.bench_statement_cache --calls 20000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.migrations.migrator import upgrade_to_head
+from infrastructure.database.models.pharmacy import Doctor, MainSpec
+from infrastructure.database.models.users import User
+from infrastructure.database.repo.pharmacy_repo import _DOCTORS_BY_LPU
+from infrastructure.database.repo.user_repo import _PROFILE_BY_TG_ID
+from infrastructure.database.sqlite_profile import SQLiteProfile, create_sqlite_engine
+from infrastructure.database.statement_cache import track_compiled_cache
+
+
+def build_doctors(lpu_id: int):
+    return (
+        select(Doctor.id, Doctor.lpu_id, Doctor.doctor, Doctor.spec_id, Doctor.numb, MainSpec.spec)
+        .outerjoin(Doctor.specialty)
+        .where(Doctor.lpu_id == lpu_id)
+        .order_by(Doctor.doctor)
+    )
+
+
+def build_profile(user_id: int):
+    return select(
+        User.id, User.user_id, User.user_name, User.region, User.is_approved, User.logged_in
+    ).where(User.user_id == user_id)
+
+
+def bench_python(calls: int):
+    """Только Python: сборка выражения + cache key (то, что SQLAlchemy делает на каждый execute)"""
+    cases = [
+        ("doctors/built", lambda i: build_doctors(i)._generate_cache_key()),
+        ("doctors/prebuilt", lambda i: _DOCTORS_BY_LPU._generate_cache_key()),
+        ("profile/built", lambda i: build_profile(i)._generate_cache_key()),
+        ("profile/prebuilt", lambda i: _PROFILE_BY_TG_ID._generate_cache_key()),
+    ]
+    for name, fn in cases:
+        started = time.perf_counter()
+        for i in range(calls):
+            fn(i % 50)
+        per_call = (time.perf_counter() - started) / calls * 1e6
+        print(f"{name:<20} build+key {per_call:8.2f} µs/call")
+
+
+async def bench_execute(calls: int):
+    """Полный путь session.execute на маленькой базе (в основном — накладные расходы SQLAlchemy)"""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", SQLiteProfile())
+    await upgrade_to_head(engine)
+    stats = track_compiled_cache(engine, "bench")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with factory() as session:
+        for name, make in (
+            ("doctors/built", lambda i: (build_doctors(i), None)),
+            ("doctors/prebuilt", lambda i: (_DOCTORS_BY_LPU, {"lpu_id": i})),
+            ("profile/built", lambda i: (build_profile(i), None)),
+            ("profile/prebuilt", lambda i: (_PROFILE_BY_TG_ID, {"user_id": i})),
+        ):
+            started = time.perf_counter()
+            for i in range(calls):
+                stmt, params = make(i % 50)
+                (await session.execute(stmt, params)).all()
+            per_call = (time.perf_counter() - started) / calls * 1e6
+            print(f"{name:<20} execute   {per_call:8.2f} µs/call")
+
+    stats.log()
+    print(f"compiled cache: {stats.stats}, hit ratio {stats.hit_ratio:.1%}")
+    await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    bench_python(args.calls)
+    await bench_execute(max(args.calls // 10, 1))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,8 @@
 from typing import Union
 from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
-from loader import accountantDB
+
+from infrastructure.database.repo.user_repo import UserRepository
 
 
 class IsLoggedInFilter(BaseFilter):
@@ -9,15 +10,15 @@ class IsLoggedInFilter(BaseFilter):
     Фильтр проверяет, авторизован ли пользователь в системе.
     Работает и для Сообщений, и для CallbackQuery (кнопок).
     """
-    async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
+    async def __call__(self, event: Union[Message, CallbackQuery], user_repo: UserRepository) -> bool:
         # 1. Безопасное получение пользователя (работает и для msg, и для call)
         user = event.from_user
         if not user:
             return False
 
-        # 2. Проверяем статус в БД
-        # Метод get_active_username уже содержит проверку "WHERE logged_in = 1"
-        active_username = await accountantDB.get_active_username(user.id)
+        # 2. Профиль берется из кеша (user_cache) — проверка доступа без запроса к БД.
+        # DatabaseMiddleware висит на dp.update, поэтому user_repo уже в данных хэндлера
+        profile = await user_repo.get_profile(user.id)
 
-        # 3. Возвращаем True, если имя найдено (значит юзер залогинен)
-        return active_username is not None
\ No newline at end of file
+        # 3. Пропускаем только существующих пользователей с активной сессией
+        return bool(profile and profile.logged_in)
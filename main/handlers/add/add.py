@@ -3,6 +3,7 @@ from aiogram.fsm.context import FSMContext
 
 # 🔥 НОВЫЕ ИМПОРТЫ РЕПОЗИТОРИЕВ
 from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
+from infrastructure.database.unit_of_work import commit_now, set_rollback_only
 from utils.logger.logger_config import logger
 from utils.ui.ui_helper import safe_clear_state
 
@@ -58,6 +59,7 @@ async def process_lpu_final(
     try:
         # Добавляем в БД через DI репозиторий
         await pharmacy_repo.add_lpu(road_id, name, final_url)
+        await commit_now(pharmacy_repo.session)
         logger.info(f"✅ Added LPU: {name}")
 
         await message.answer(f"✅ ЛПУ <b>«{name}»</b> добавлено!")
@@ -73,6 +75,7 @@ async def process_lpu_final(
 
     except Exception as e:
         logger.critical(f"DB Error adding LPU: {e}")
+        set_rollback_only(pharmacy_repo.session)
         await message.answer("❌ Ошибка при добавлении.")
 
 
@@ -113,6 +116,7 @@ async def process_ap_final(
 
     try:
         await pharmacy_repo.add_apothecary(road_id, name, final_url)
+        await commit_now(pharmacy_repo.session)
         logger.info(f"✅ Added Apothecary: {name}")
 
         await message.answer(f"✅ Аптека <b>«{name}»</b> добавлена!")
@@ -125,6 +129,7 @@ async def process_ap_final(
 
     except Exception as e:
         logger.critical(f"DB Error: {e}")
+        set_rollback_only(pharmacy_repo.session)
         await message.answer("Ошибка добавления.")
 
 
@@ -183,8 +188,16 @@ async def process_spec_text(
 ):
     spec_name = message.text.strip()
 
-    # Магия: ищем или создаем
-    spec_id = await pharmacy_repo.get_or_create_spec_id(spec_name)
+    try:
+        # Магия: ищем или создаем
+        spec_id = await pharmacy_repo.get_or_create_spec_id(spec_name)
+        await commit_now(pharmacy_repo.session)
+    except Exception as e:
+        logger.critical(f"DB Error adding Spec: {e}")
+        set_rollback_only(pharmacy_repo.session)
+        await message.answer("Ошибка добавления специальности. Попробуйте еще раз.")
+        return
+
     await state.update_data(new_doc_spec_id=spec_id)
 
     await message.answer(f"✨ Новая специальность <b>«{spec_name}»</b> добавлена в справочник!")
@@ -213,6 +226,7 @@ async def process_doc_final(
 
     try:
         await pharmacy_repo.add_doctor(lpu_id, name, spec_id, phone)
+        await commit_now(pharmacy_repo.session)
         await message.answer(f"✅ Врач <b>{name}</b> успешно добавлен!")
 
         # Показываем список
@@ -229,4 +243,5 @@ async def process_doc_final(
 
     except Exception as e:
         logger.critical(f"DB Error adding Doctor: {e}")
+        set_rollback_only(pharmacy_repo.session)
         await message.answer(f"❌ Ошибка базы: {e}")
\ No newline at end of file
@@ -3,8 +3,11 @@ from aiogram.fsm.context import FSMContext
 
 # 🔥 ТОЛЬКО НОВЫЕ ИМПОРТЫ РЕПОЗИТОРИЕВ
 from infrastructure.database.repo.user_repo import UserRepository
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.db_helper import db_helper
+from infrastructure.database.unit_of_work import commit_now, set_rollback_only
+from infrastructure.cache.territory_index import territory_index
+from infrastructure.cache.medication_catalog import medication_catalog
 
 from states.menu.main_menu_state import MainMenu
 from states.add.prescription_state import PrescriptionFSM
@@ -17,13 +20,28 @@ from utils.ui.ui_helper import safe_clear_state
 router = Router()
 
 
+async def persist_report(kind: str, report: dict, reports_db: ReportRepository):
+    """
+    Write-behind включен — кладем отчет в надежную очередь (мгновенный ответ агенту),
+    иначе пишем шапку + препараты в транзакцию апдейта и сразу фиксируем ее:
+    «сохранено» агент увидит только после успешного commit.
+    """
+    if db_helper.report_queue:
+        return await db_helper.report_queue.enqueue(kind, report)
+
+    if kind == "doctor":
+        await reports_db.add_doctor_report(**report)
+    else:
+        await reports_db.add_apothecary_report(**report)
+    await commit_now(reports_db.session)
+
+
 @router.callback_query(F.data == "confirm_yes", PrescriptionFSM.confirmation)
 async def final_save_report(
         callback: types.CallbackQuery,
         state: FSMContext,
         reports_db: ReportRepository,
-        user_repo: UserRepository,
-        pharmacy_repo: PharmacyRepository
+        user_repo: UserRepository
 ):
     """
     Финальное сохранение отчета (Работает и для Врачей, и для Аптек).
@@ -32,9 +50,10 @@ async def final_save_report(
     real_name = callback.from_user.full_name or f"User_{user_id}"
 
     # 1. Получаем Имя через DI (без async for)
-    user_db = await user_repo.get_user(user_id)
+    user_db = await user_repo.get_profile(user_id)
     if user_db and user_db.user_name:
         real_name = user_db.user_name
+    user_pk = user_db.id if user_db else None
 
     # 2. Получаем данные из нативного FSM
     data = await state.get_data()
@@ -65,8 +84,16 @@ async def final_save_report(
             doc_num = data.get("doc_num")
             terms = data.get("contract_terms") or "Нет условий"
 
-            # Сохраняем ОСНОВНОЙ отчет (возвращает объект модели)
-            report = await reports_db.save_main_report(
+            # Препараты (ID справочника + название)
+            selected_ids = data.get("selected_items", [])
+            version = data.get("catalog_version")
+            prep_items = []
+
+            for pid in selected_ids:
+                name = medication_catalog.name(pid, version) or f"Unknown ID {pid}"
+                prep_items.append((int(pid), name))
+
+            report = dict(
                 user=real_name,
                 district=district_name,
                 road=road_num,  # Передаем int, как прописано в модели
@@ -75,33 +102,30 @@ async def final_save_report(
                 doctor_spec=doc_spec,
                 doctor_number=str(doc_num) if doc_num else None,
                 term=terms,
-                comment=comment
+                comment=comment,
+                preps=prep_items,
+                user_id=user_pk,
+                district_id=data.get("district_id"),
+                lpu_id=lpu_id,
+                doctor_id=data.get("doc_id"),
+                spec_id=data.get("doc_spec_id")
             )
-
-            # Сохраняем ПРЕПАРАТЫ
-            selected_ids = data.get("selected_items", [])
-            prep_map = data.get("prep_map", {})
-            prep_names = []
-
-            for pid in selected_ids:
-                name = prep_map.get(str(pid)) or prep_map.get(int(pid)) or f"Unknown ID {pid}"
-                prep_names.append(name)
-
-            if prep_names:
-                await reports_db.save_preps(report.id, prep_names)
+            await persist_report("doctor", report, reports_db)
 
             await callback.answer("✅ Отчет по врачу сохранен!", show_alert=False)
 
             # Очищаем только данные о враче, чтобы выбрать следующего
+            # (catalog_version тоже: следующий врач получит свежий справочник препаратов)
             await state.update_data(
                 selected_items=[],
+                catalog_version=None,
                 comms="",
                 contract_terms="",
                 doc_name=""
             )
 
             if lpu_id:
-                doctors = await pharmacy_repo.get_doctors_by_lpu(lpu_id)
+                doctors = territory_index.get_doctors_by_lpu(lpu_id)
                 keyboard = await get_doctors_inline(doctors, lpu_id=lpu_id, page=1, state=state)
 
                 await state.set_state(PrescriptionFSM.choose_doctor)
@@ -121,25 +145,23 @@ async def final_save_report(
         # ==========================================
         elif prefix == "apt":
             final_quantities = data.get("final_quantities", {})
-            prep_map = data.get("prep_map", {})
+            version = data.get("catalog_version")
+
+            # Формируем список кортежей (name, req, rem)
+            items_to_save = []
+            for p_id_str, vals in final_quantities.items():
+                name = medication_catalog.name(p_id_str, version) or f"ID {p_id_str}"
+                items_to_save.append((name, vals['req'], vals['rem']))
 
-            # Сохраняем отчет (возвращает объект модели)
-            report = await reports_db.save_apothecary_report(
+            report = dict(
                 user=real_name,
                 district=district_name,
                 road=road_num,  # Передаем int
                 lpu=lpu_name,
-                comment=comment
+                comment=comment,
+                items=items_to_save
             )
-
-            # Формируем список кортежей (name, req, rem) для нового метода
-            items_to_save = []
-            for p_id_str, vals in final_quantities.items():
-                name = prep_map.get(str(p_id_str)) or prep_map.get(int(p_id_str)) or f"ID {p_id_str}"
-                items_to_save.append((name, vals['req'], vals['rem']))
-
-            if items_to_save:
-                await reports_db.save_apothecary_preps(report.id, items_to_save)
+            await persist_report("apothecary", report, reports_db)
 
             kb = await get_main_menu_inline(user_id, reports_db)
             await state.set_state(MainMenu.logged_in)
@@ -155,4 +177,6 @@ async def final_save_report(
 
     except Exception as e:
         logger.error(f"❌ Ошибка сохранения отчета: {e}", exc_info=True)
+        # Ошибку не пробрасываем — значит, откатить недописанное должен middleware
+        set_rollback_only(reports_db.session)
         await callback.answer("Ошибка базы данных при сохранении!", show_alert=True)
\ No newline at end of file
@@ -3,10 +3,11 @@ from aiogram import Router, types, F
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
+from infrastructure.cache.territory_index import territory_index
+from infrastructure.cache.medication_catalog import medication_catalog, CatalogSnapshot
 from states.add.prescription_state import PrescriptionFSM
 
-from keyboard.inline.inline_select import build_multi_select_keyboard
+from keyboard.inline.inline_select import get_multi_select_keyboard, toggle_multi_select_keyboard
 from keyboard.inline.inline_buttons import get_confirm_inline, get_doctors_inline
 
 router = Router()
@@ -15,26 +16,19 @@ router = Router()
 # ============================================================
 # 📥 ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ
 # ============================================================
-async def ensure_prep_items_loaded(state: FSMContext, pharmacy_repo: PharmacyRepository):
+async def get_prep_catalog(state: FSMContext) -> CatalogSnapshot:
+    """
+    Справочник препаратов общий для всех (medication_catalog), в FSM пишем только его версию —
+    чтобы имена на клавиатуре и в отчете совпадали, даже если справочник перезагрузили.
+    """
     data = await state.get_data()
-    items = data.get("prep_items")
+    version = data.get("catalog_version")
 
-    if items is None:
-        all_preps = await pharmacy_repo.get_preps()
-        items = []
-        prep_map = {}
-
-        for p in all_preps:
-            p_id = getattr(p, 'id', None)
-            p_name = getattr(p, 'prep', None)
-
-            if p_id and p_name:
-                items.append((p_id, p_name))
-                prep_map[str(p_id)] = p_name
-                prep_map[int(p_id)] = p_name
-
-        await state.update_data(prep_items=items, prep_map=prep_map)
-    return items
+    if version is None:
+        catalog = medication_catalog.current
+        await state.update_data(catalog_version=catalog.version)
+        return catalog
+    return medication_catalog.get(version)
 
 
 # ============================================================
@@ -43,18 +37,17 @@ async def ensure_prep_items_loaded(state: FSMContext, pharmacy_repo: PharmacyRep
 @router.callback_query(F.data.in_(["confirm_yes", "confirm_no"]), PrescriptionFSM.choose_apothecary)
 async def process_confirmation_step(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     if callback.data == "confirm_no":
         await state.set_state(PrescriptionFSM.pharmacy_comments)
         await callback.message.edit_text("✍️ Напишите комментарий к визиту (или «-»):")
         return await callback.answer()
 
-    items = await ensure_prep_items_loaded(state, pharmacy_repo)
+    catalog = await get_prep_catalog(state)
     await state.update_data(selected_items=[])
 
-    kb = build_multi_select_keyboard(items, [], "apt")
+    kb = get_multi_select_keyboard(catalog, [], "apt")
     await state.set_state(PrescriptionFSM.choose_meds)
 
     await callback.message.edit_text("💊 <b>Выберите препараты:</b>", reply_markup=kb)
@@ -67,8 +60,7 @@ async def process_confirmation_step(
 @router.callback_query(F.data.startswith("select_"), PrescriptionFSM.choose_meds)
 async def toggle_selection(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     try:
         _, prefix, option_id = callback.data.split("_")
@@ -76,9 +68,10 @@ async def toggle_selection(
     except ValueError:
         return await callback.answer("Ошибка кнопки")
 
+    catalog = await get_prep_catalog(state)
     data = await state.get_data()
-    items = data.get("prep_items") or await ensure_prep_items_loaded(state, pharmacy_repo)
     selected = data.get("selected_items", [])
+    selected_before = tuple(selected)
 
     if option_id in selected:
         selected.remove(option_id)
@@ -86,7 +79,8 @@ async def toggle_selection(
         selected.append(option_id)
 
     await state.update_data(selected_items=selected)
-    new_keyboard = build_multi_select_keyboard(items, selected, prefix)
+    # Меняется одна строка предыдущей клавиатуры, остальные кнопки готовые
+    new_keyboard = toggle_multi_select_keyboard(catalog, selected_before, option_id, prefix)
 
     with suppress(TelegramBadRequest):
         await callback.message.edit_reply_markup(reply_markup=new_keyboard)
@@ -97,13 +91,13 @@ async def toggle_selection(
 # 🔄 СБРОС И ПОДТВЕРЖДЕНИЕ ВЫБОРА
 # ============================================================
 @router.callback_query(F.data == "reset_selection", PrescriptionFSM.choose_meds)
-async def reset_selection(callback: types.CallbackQuery, state: FSMContext, pharmacy_repo: PharmacyRepository):
-    items = await ensure_prep_items_loaded(state, pharmacy_repo)
+async def reset_selection(callback: types.CallbackQuery, state: FSMContext):
+    catalog = await get_prep_catalog(state)
     data = await state.get_data()
     prefix = data.get("prefix", "doc")
 
     await state.update_data(selected_items=[])
-    kb = build_multi_select_keyboard(items, [], prefix)
+    kb = get_multi_select_keyboard(catalog, [], prefix)
 
     with suppress(TelegramBadRequest):
         await callback.message.edit_reply_markup(reply_markup=kb)
@@ -122,8 +116,7 @@ async def confirm_selection(callback: types.CallbackQuery, state: FSMContext):
 
     if prefix == "doc":
         await state.set_state(PrescriptionFSM.contract_terms)
-        prep_map = data.get("prep_map", {})
-        names = [prep_map.get(str(i)) or prep_map.get(int(i)) or f"ID {i}" for i in selected_ids]
+        names = medication_catalog.names(selected_ids, data.get("catalog_version"))
         names_str = "\n".join([f"• {n}" for n in names])
 
         await callback.message.edit_text(f"✅ <b>Выбрано:</b>\n{names_str}\n\n✍️ Введите условия договора:")
@@ -144,11 +137,11 @@ async def ask_next_pharmacy_item(message: types.Message, state: FSMContext):
 
     if not queue:
         final_quantities = data.get("final_quantities", {})
-        prep_map = data.get("prep_map", {})
+        version = data.get("catalog_version")
 
         summary_text = "<b>✅ Данные приняты:</b>\n\n"
         for p_id_str, val in final_quantities.items():
-            name = prep_map.get(str(p_id_str)) or prep_map.get(int(p_id_str)) or f"ID {p_id_str}"
+            name = medication_catalog.name(p_id_str, version) or f"ID {p_id_str}"
             summary_text += f"• {name}\n   └ Заявка: {val['req']} | Остаток: {val['rem']}\n"
 
         await message.answer(summary_text)
@@ -157,8 +150,7 @@ async def ask_next_pharmacy_item(message: types.Message, state: FSMContext):
         return
 
     current_id = queue[0]
-    prep_map = data.get("prep_map", {})
-    current_name = prep_map.get(str(current_id)) or prep_map.get(int(current_id)) or f"ID {current_id}"
+    current_name = medication_catalog.name(current_id, data.get("catalog_version")) or f"ID {current_id}"
 
     await state.update_data(current_process_id=current_id, current_process_name=current_name)
     await message.answer(f"💊 Препарат: <b>{current_name}</b>\n\n1️⃣ Введите <b>ЗАЯВКУ</b> (сколько заказать):")
@@ -194,11 +186,11 @@ async def process_rem_qty(message: types.Message, state: FSMContext):
 
 # Пагинация врачей (оставили тут, чтобы не потерять)
 @router.callback_query(F.data.startswith("docpage_"))
-async def paginate_doctors(callback: types.CallbackQuery, state: FSMContext, pharmacy_repo: PharmacyRepository):
+async def paginate_doctors(callback: types.CallbackQuery, state: FSMContext):
     try:
         parts = callback.data.split("_")
         lpu_id, page = int(parts[1]), int(parts[2])
-        doctors = await pharmacy_repo.get_doctors_by_lpu(lpu_id)
+        doctors = territory_index.get_doctors_by_lpu(lpu_id)
         kb = await get_doctors_inline(doctors, lpu_id, page, state)
         with suppress(TelegramBadRequest):
             await callback.message.edit_reply_markup(reply_markup=kb)
@@ -1,6 +1,7 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from keyboard.inline import inline_buttons
+from infrastructure.cache.medication_catalog import medication_catalog
 
 from states.add.prescription_state import PrescriptionFSM
 
@@ -62,8 +63,7 @@ async def show_report_card(callback: types.CallbackQuery, state: FSMContext):
 
         # Собираем препараты
         selected_ids = data.get("selected_items", [])
-        prep_map = data.get("prep_map", {})
-        preps = [prep_map.get(str(i)) or prep_map.get(int(i)) or f"ID {i}" for i in selected_ids]
+        preps = medication_catalog.names(selected_ids, data.get("catalog_version"))
         preps_str = "\n".join([f"• {p}" for p in preps]) if preps else "—"
 
         text = (
@@ -80,11 +80,11 @@ async def show_report_card(callback: types.CallbackQuery, state: FSMContext):
 
         # Собираем препараты с заявками и остатками
         final_quantities = data.get("final_quantities", {})
-        prep_map = data.get("prep_map", {})
+        version = data.get("catalog_version")
         preps_str = ""
 
         for p_id_str, vals in final_quantities.items():
-            name = prep_map.get(str(p_id_str)) or prep_map.get(int(p_id_str)) or f"ID {p_id_str}"
+            name = medication_catalog.name(p_id_str, version) or f"ID {p_id_str}"
             preps_str += f"• {name}\n   └ Заявка: {vals['req']} | Остаток: {vals['rem']}\n"
 
         if not preps_str:
@@ -1,21 +1,26 @@
 from aiogram import Router, F, types
-from aiogram.types import BufferedInputFile, CallbackQuery
+from aiogram.types import CallbackQuery
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.exceptions import TelegramAPIError
+from contextlib import suppress
 from datetime import datetime, timedelta
 
 # 1. Импорты НОВЫХ репозиториев (Clean Architecture)
 from infrastructure.database.repo.user_repo import UserRepository
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.unit_of_work import commit_now
 
 # 2. Утилиты и логирование
-from utils.report.excel_generator import create_excel_report
+from utils.report.export_jobs import ExportQueueFull, ExportRequest, Subscriber, export_jobs
 from utils.logger.logger_config import logger
 from utils.ui.ui_helper import safe_clear_state
 
 # 3. Клавиатуры и состояния
-from keyboard.inline.admin_kb import get_admin_menu, get_report_period_kb, get_report_users_kb
+from keyboard.inline.admin_kb import (
+    get_admin_menu, get_export_progress_kb, get_report_period_kb, get_report_users_kb
+)
 from keyboard.inline.menu_kb import get_main_menu_inline
 from states.admin.report_states import AdminReportFSM
 
@@ -40,6 +45,7 @@ async def admin_start_task(callback: types.CallbackQuery, state: FSMContext):
 async def admin_save_task(message: types.Message, state: FSMContext, reports_db: ReportRepository):
     text = message.text
     await reports_db.add_task(text)
+    await commit_now(reports_db.session)
 
     await message.answer(f"✅ Задача опубликована:\n\n<i>{text}</i>", reply_markup=get_admin_menu())
     await safe_clear_state(state)
@@ -60,48 +66,21 @@ async def start_export_flow(callback: types.CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(AdminReportFSM.choose_period, F.data.startswith("period_"))
-async def process_period(
-        callback: types.CallbackQuery,
-        state: FSMContext,
-        user_repo: UserRepository,
-        reports_db: ReportRepository  # <-- Добавили reports_db сюда!
-):
+async def process_period(callback: types.CallbackQuery, state: FSMContext, user_repo: UserRepository):
     mode = callback.data.split("_")[1]
 
     # === 🔥 НОВАЯ ЛОГИКА: ЗА ВСЁ ВРЕМЯ ===
     if mode == "alltime":
-        await callback.message.edit_text("⏳ <b>Формирую полную выгрузку за всё время...</b>\nПожалуйста, подождите.")
-
-        try:
-            # Запрашиваем ВСЮ базу без фильтров
-            doc_data = await reports_db.get_all_doctor_reports()
-            apt_data = await reports_db.get_all_apothecary_reports()
-
-            if not doc_data and not apt_data:
-                await callback.message.edit_text("❌ <b>База данных пуста.</b>", reply_markup=get_admin_menu())
-                return await safe_clear_state(state)
-
-            excel_file = create_excel_report(doc_data, apt_data)
-            filename = f"Full_Database_Dump_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
-            file_to_send = BufferedInputFile(excel_file.read(), filename=filename)
-
-            await callback.message.answer_document(
-                document=file_to_send,
-                caption="📊 <b>Полная выгрузка базы данных</b> (За всё время)"
-            )
-            await callback.message.answer("Админ-панель:", reply_markup=get_admin_menu())
-
-        except Exception as e:
-            logger.error(f"Full Export Error: {e}")
-            await callback.message.answer(f"❌ Ошибка выгрузки: {e}", reply_markup=get_admin_menu())
-
-        finally:
-            # Удаляем сообщение с часиками и чистим стейт
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            return await safe_clear_state(state)
+        # Вся база без фильтров; выгрузка идет в фоне, хэндлер сразу освобождается
+        request = ExportRequest(
+            start_date=None,
+            end_date=None,
+            user_name="all",
+            filename=f"Full_Database_Dump_{datetime.now().strftime('%Y-%m-%d')}.xlsx",
+            caption="📊 <b>Полная выгрузка базы данных</b> (За всё время)",
+            empty_text="❌ <b>База данных пуста.</b>"
+        )
+        return await submit_export(callback, state, request)
 
     # === СТАРАЯ ЛОГИКА: ФИЛЬТРЫ ПО ДАТАМ ===
     today = datetime.now().date()
@@ -129,68 +108,70 @@ async def process_period(
 
 
 @router.callback_query(AdminReportFSM.choose_employee, F.data.startswith("user_filter_"))
-async def process_user_and_generate(
-        callback: types.CallbackQuery,
-        state: FSMContext,
-        reports_db: ReportRepository
-):
+async def process_user_and_generate(callback: types.CallbackQuery, state: FSMContext):
     selected_user = callback.data.split("user_filter_")[1]
 
     data = await state.get_data()
     start_date = data.get('start_date')
     end_date = data.get('end_date')
 
-    await callback.message.edit_text(
-        f"⏳ <b>Формирую отчет...</b>\n"
-        f"📅 {start_date} — {end_date}\n"
-        f"👤 Сотрудник: {selected_user}\n"
-        "Пожалуйста, подождите."
+    # Имя файла
+    filename = f"Report_{start_date}_to_{end_date}.xlsx"
+    if selected_user != "all":
+        filename = f"Report_{selected_user}_{start_date}.xlsx"
+
+    request = ExportRequest(
+        start_date=start_date,
+        end_date=end_date,
+        user_name=selected_user,
+        filename=filename,
+        caption=(
+            f"📊 <b>Готовый отчет</b>\n"
+            f"📅 Период: {start_date} — {end_date}\n"
+            f"👤 Фильтр: {selected_user}"
+        ),
+        empty_text="❌ <b>За выбранный период данных нет.</b>"
     )
+    await submit_export(callback, state, request)
 
-    try:
-        # Получаем словари из нового ReportRepository
-        doc_data = await reports_db.fetch_filtered_doctor_data(start_date, end_date, selected_user)
-        apt_data = await reports_db.fetch_filtered_apothecary_data(start_date, end_date, selected_user)
-
-        if not doc_data and not apt_data:
-            await callback.message.edit_text(
-                "❌ <b>За выбранный период данных нет.</b>",
-                reply_markup=get_admin_menu()
-            )
-            await safe_clear_state(state)
-            return
 
-        # Генерация Excel
-        excel_file = create_excel_report(doc_data, apt_data)
-
-        # Имя файла
-        filename = f"Report_{start_date}_to_{end_date}.xlsx"
-        if selected_user != "all":
-            filename = f"Report_{selected_user}_{start_date}.xlsx"
+async def submit_export(callback: types.CallbackQuery, state: FSMContext, request: ExportRequest):
+    """Ставит выгрузку в фоновую очередь; файл и прогресс придут в это же сообщение"""
+    await callback.answer()
+    subscriber = Subscriber(callback.message.chat.id, callback.message.message_id)
 
-        file_to_send = BufferedInputFile(excel_file.read(), filename=filename)
+    # Те же данные уже выгружали — файл уходит сразу по file_id, без очереди
+    if await export_jobs.serve_cached(request, callback.bot, subscriber):
+        return await safe_clear_state(state)
 
-        await callback.message.answer_document(
-            document=file_to_send,
-            caption=(
-                f"📊 <b>Готовый отчет</b>\n"
-                f"📅 Период: {start_date} — {end_date}\n"
-                f"👤 Фильтр: {selected_user}"
-            )
+    try:
+        job, is_new = export_jobs.submit(request, callback.bot, subscriber)
+    except ExportQueueFull:
+        await callback.message.edit_text(
+            "⚠️ <b>Сейчас формируется слишком много выгрузок.</b>\nПопробуйте через пару минут.",
+            reply_markup=get_admin_menu()
         )
+        return await safe_clear_state(state)
 
-        await callback.message.answer("Админ-панель:", reply_markup=get_admin_menu())
+    if is_new:
+        text = "⏳ <b>Выгрузка поставлена в очередь.</b>\nФайл придет сюда, бота можно пользоваться дальше."
+    else:
+        text = "⏳ <b>Такая выгрузка уже формируется.</b>\nФайл придет сюда, как только будет готов."
+    await callback.message.edit_text(text, reply_markup=get_export_progress_kb(job.id))
+    await safe_clear_state(state)
 
-        try:
-            await callback.message.delete()
-        except Exception:
-            pass
 
-    except Exception as e:
-        logger.error(f"Export Error: {e}")
-        await callback.message.answer(f"❌ Ошибка при экспорте: {e}", reply_markup=get_admin_menu())
+@router.callback_query(F.data.startswith("export_cancel_"))
+async def cancel_export(callback: types.CallbackQuery):
+    job_id = int(callback.data.split("export_cancel_")[1])
 
-    await safe_clear_state(state)
+    if export_jobs.cancel(job_id, callback.message.chat.id):
+        # Задача могла как раз доставить файл и удалить это сообщение
+        with suppress(TelegramAPIError):
+            await callback.message.edit_text("🚫 Выгрузка отменена.", reply_markup=get_admin_menu())
+        await callback.answer()
+    else:
+        await callback.answer("Выгрузка уже завершена.", show_alert=True)
 
 
 @router.callback_query(F.data == "admin_cancel")
@@ -252,6 +233,8 @@ async def process_user_decision(
     if action == "approve":
         # 1. Обновляем статус через новый репо
         await user_repo.approve_user(target_user_id)
+        # Фиксируем до уведомлений: пользователь не должен узнать об одобрении, которого нет в базе
+        await commit_now(user_repo.session)
         await callback.answer("✅ Пользователь допущен!")
 
         # 2. Уведомляем пользователя
@@ -270,6 +253,7 @@ async def process_user_decision(
     elif action == "reject":
         # 1. Удаляем через новый репо
         await user_repo.delete_user(target_user_id)
+        await commit_now(user_repo.session)
         await callback.answer("❌ Заявка отклонена.")
 
         # 2. Уведомляем
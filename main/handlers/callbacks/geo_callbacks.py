@@ -1,9 +1,8 @@
-from collections import namedtuple
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 
-# Импорты репозиториев для DI
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
+# Справочник территорий в памяти (навигация без запросов к БД)
+from infrastructure.cache.territory_index import territory_index
 
 # Импорты состояний
 from states.add.prescription_state import PrescriptionFSM
@@ -14,10 +13,6 @@ from keyboard.inline import inline_buttons
 
 router = Router()
 
-# Создаем легковесный "объект" для маршрутов, чтобы подружить его с ORM-клавиатурой
-MockRoad = namedtuple("MockRoad", ["road_num"])
-
-
 # ============================================================
 # 🗺 НАВИГАЦИЯ (Выбор района)
 # ============================================================
@@ -26,8 +21,7 @@ MockRoad = namedtuple("MockRoad", ["road_num"])
 @router.callback_query(F.data.startswith("district_") | F.data.startswith("a_district_"))
 async def process_district(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     is_pharmacy = callback.data.startswith("a_district_")
 
@@ -36,8 +30,8 @@ async def process_district(
     except ValueError:
         return await callback.answer("Ошибка: неверный ID района")
 
-    # 1. Используем DI репозиторий
-    district = await pharmacy_repo.get_district_by_id(district_id)
+    # 1. Берем район из индекса в памяти
+    district = territory_index.get_district(district_id)
 
     if not district:
         return await callback.answer("Район не найден", show_alert=True)
@@ -50,10 +44,7 @@ async def process_district(
 
     prefix = "a_road" if is_pharmacy else "road"
 
-    # 🔥 Генерируем объекты, а не словари! Теперь `getattr` отработает идеально.
-    roads_fixed = [MockRoad(road_num=i) for i in range(1, 8)]
-
-    kb = await inline_buttons.get_road_inline(roads_fixed, state, prefix=prefix)
+    kb = await inline_buttons.get_road_numbers_inline(prefix=prefix)
 
     await callback.message.edit_text(
         f"✅ Район: <b>{district.name}</b>\nВыберите номер маршрута:",
@@ -69,8 +60,7 @@ async def process_district(
 @router.callback_query(F.data.startswith("road_") | F.data.startswith("a_road_"))
 async def process_road(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     is_pharmacy = callback.data.startswith("a_road_")
     road_num = int(callback.data.split("_")[-1])
@@ -86,8 +76,8 @@ async def process_road(
     # 2. Сохраняем номер маршрута
     await state.update_data(road_num=road_num)
 
-    # 3. Ищем road_id через DI репозиторий
-    road_id = await pharmacy_repo.get_road_id_by_data(district_id, road_num)
+    # 3. Ищем road_id в индексе
+    road_id = territory_index.get_road_id(district_id, road_num)
 
     if not road_id:
         return await callback.answer(f"Маршрут №{road_num} не найден в базе.", show_alert=True)
@@ -98,13 +88,11 @@ async def process_road(
     # 4. Загружаем объекты и ставим стейты
     if is_pharmacy:
         await state.set_state(PrescriptionFSM.choose_apothecary)
-        items = await pharmacy_repo.get_apothecaries_by_road(road_id)
-        kb = await inline_buttons.get_apothecary_inline(items, state)
+        kb = await inline_buttons.get_road_apothecaries_inline(road_id)
         title = "🏪 <b>Аптеки</b>"
     else:
         await state.set_state(PrescriptionFSM.choose_lpu)
-        items = await pharmacy_repo.get_lpus_by_road(road_id)
-        kb = await inline_buttons.get_lpu_inline(items, state)
+        kb = await inline_buttons.get_road_lpus_inline(road_id)
         title = "🏥 <b>ЛПУ</b>"
 
     await callback.message.edit_text(
@@ -3,8 +3,8 @@ from aiogram.fsm.context import FSMContext
 
 # 🔥 НОВЫЕ ИМПОРТЫ РЕПОЗИТОРИЕВ
 from infrastructure.database.repo.user_repo import UserRepository
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.unit_of_work import commit_now, set_rollback_only
 
 # Импорты состояний
 from states.add.prescription_state import PrescriptionFSM
@@ -28,8 +28,7 @@ router = Router()
 async def on_menu_route(
         callback: types.CallbackQuery,
         state: FSMContext,
-        user_repo: UserRepository,
-        pharmacy_repo: PharmacyRepository
+        user_repo: UserRepository
 ):
     """Нажата кнопка 'Маршрут' (ЛПУ и Врачи)"""
     await state.set_state(PrescriptionFSM.choose_lpu)
@@ -40,14 +39,11 @@ async def on_menu_route(
 
     # Фолбэк (если вдруг бот перезагрузился и забыл сессию)
     if not region:
-        user = await user_repo.get_user(callback.from_user.id)
+        user = await user_repo.get_profile(callback.from_user.id)
         region = user.region if user and user.region else "АЛА"
 
-    # 2. Достаем районы
-    districts = await pharmacy_repo.get_districts_by_region(region)
-
-    # 3. Формируем клавиатуру
-    kb = await inline_buttons.get_district_inline(districts, state, prefix="district")
+    # 2. Районы региона (готовая разметка, пока справочник не менялся)
+    kb = await inline_buttons.get_region_districts_inline(region, prefix="district")
     await callback.message.edit_text("📍 Выберите район:", reply_markup=kb)
     await callback.answer()
 
@@ -56,8 +52,7 @@ async def on_menu_route(
 async def on_menu_pharmacy(
         callback: types.CallbackQuery,
         state: FSMContext,
-        user_repo: UserRepository,
-        pharmacy_repo: PharmacyRepository
+        user_repo: UserRepository
 ):
     """Нажата кнопка 'Аптека'"""
     await state.set_state(PrescriptionFSM.choose_apothecary)
@@ -67,12 +62,10 @@ async def on_menu_pharmacy(
     region = data.get("user_region")
 
     if not region:
-        user = await user_repo.get_user(callback.from_user.id)
+        user = await user_repo.get_profile(callback.from_user.id)
         region = user.region if user and user.region else "АЛА"
 
-    districts = await pharmacy_repo.get_districts_by_region(region)
-
-    keyboard = await inline_buttons.get_district_inline(districts, state, prefix="a_district")
+    keyboard = await inline_buttons.get_region_districts_inline(region, prefix="a_district")
 
     await callback.message.edit_text(
         f"🏥 <b>Раздел: Аптека</b>\nРегион: {region}\nВыберите район:",
@@ -122,8 +115,10 @@ async def on_logout(callback: types.CallbackQuery, state: FSMContext, user_repo:
     """Выход из системы"""
     try:
         await user_repo.set_logged_in(callback.from_user.id, False)
+        await commit_now(user_repo.session)
     except Exception as e:
         logger.error(f"Logout error for user {callback.from_user.id}: {e}")
+        set_rollback_only(user_repo.session)
 
     await state.clear()
     await callback.message.edit_text(
@@ -3,16 +3,17 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 
 # 🔥 НОВЫЕ ИМПОРТЫ РЕПОЗИТОРИЕВ
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
+from infrastructure.database.repo.user_repo import UserRepository
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.cache.territory_index import territory_index
 
 # Состояния и клавиатуры
 from states.add.prescription_state import PrescriptionFSM
 from keyboard.inline import inline_buttons
 
 # Импорты для работы галочек (мульти-выбор)
-from handlers.add.select_handlers import ensure_prep_items_loaded
-from keyboard.inline.inline_select import build_multi_select_keyboard
+from handlers.add.select_handlers import get_prep_catalog
+from keyboard.inline.inline_select import get_multi_select_keyboard
 
 router = Router()
 
@@ -24,18 +25,17 @@ router = Router()
 @router.callback_query(F.data.startswith("lpu_"), PrescriptionFSM.choose_lpu)
 async def process_lpu(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     lpu_id = int(callback.data.split("_")[-1])
 
-    # 1. Забираем эталонные данные из базы
-    lpu = await pharmacy_repo.get_lpu_by_id(lpu_id)
+    # 1. Забираем эталонные данные из индекса территорий (без запроса к БД)
+    lpu = territory_index.get_lpu(lpu_id)
     if not lpu:
         return await callback.answer("❌ ЛПУ не найдено в базе", show_alert=True)
 
     # 2. Сохраняем все данные в нативный FSM
-    lpu_name = getattr(lpu, 'pharmacy_name', getattr(lpu, 'name', 'Неизвестное ЛПУ'))
+    lpu_name = lpu.pharmacy_name or 'Неизвестное ЛПУ'
 
     await state.update_data(
         lpu_id=lpu_id,
@@ -44,10 +44,10 @@ async def process_lpu(
 
     await state.set_state(PrescriptionFSM.choose_doctor)
 
-    url_info = f"\n🔗 <a href='{lpu.url}'>Открыть в 2GIS</a>" if getattr(lpu, 'url', None) else ""
+    url_info = f"\n🔗 <a href='{lpu.pharmacy_url}'>Открыть в 2GIS</a>" if lpu.pharmacy_url else ""
 
-    # Загружаем врачей
-    doctors = await pharmacy_repo.get_doctors_by_lpu(lpu_id)
+    # Врачи тоже из индекса
+    doctors = territory_index.get_doctors_by_lpu(lpu_id)
     keyboard = await inline_buttons.get_doctors_inline(doctors, lpu_id=lpu_id, page=1, state=state)
 
     await callback.message.edit_text(
@@ -62,50 +62,46 @@ async def process_lpu(
 async def process_doctor(
         callback: types.CallbackQuery,
         state: FSMContext,
-        pharmacy_repo: PharmacyRepository,
-        reports_db: ReportRepository
+        reports_db: ReportRepository,
+        user_repo: UserRepository
 ):
     doc_id = int(callback.data.split("_")[-1])
     user_name = callback.from_user.full_name
 
-    doctor = await pharmacy_repo.get_doctor_by_id(doc_id)
+    # Отчеты сохраняются под именем из БД — по нему (и по ID) и ищем историю
+    user_db = await user_repo.get_profile(callback.from_user.id)
+    if user_db and user_db.user_name:
+        user_name = user_db.user_name
+    user_pk = user_db.id if user_db else None
+
+    doctor = territory_index.get_doctor(doc_id)
     if not doctor:
         return await callback.answer("❌ Врач не найден", show_alert=True)
 
-    # Достаем специальность (с учетом ORM)
-    spec_name = "Не указана"
-    specialty = getattr(doctor, 'specialty', None)
-
-    if specialty and getattr(specialty, 'spec', None):
-        spec_name = specialty.spec
-    else:
-        # Фолбэк, если relationship не подгрузился
-        actual_spec_id = getattr(doctor, 'spec_id', getattr(doctor, 'main_spec_id', None))
-        if actual_spec_id:
-            fetched_spec = await pharmacy_repo.get_spec_name(actual_spec_id)
-            if fetched_spec:
-                spec_name = fetched_spec
+    # Специальность уже лежит в узле врача
+    spec_name = doctor.spec or "Не указана"
 
     # Массовое обновление стейта
-    doc_name = getattr(doctor, 'doctor', 'Неизвестный врач')
+    doc_name = doctor.doctor or 'Неизвестный врач'
     await state.update_data(
         doc_id=doc_id,
         doc_name=doc_name,
         doc_spec=spec_name,
-        doc_num=getattr(doctor, 'numb', None),
+        doc_spec_id=doctor.spec_id,
+        doc_num=doctor.numb,
         prefix="doc",
         selected_items=[]
     )
 
     # === МАГИЯ ГАЛОЧЕК ===
-    # Загружаем препараты через вспомогательную функцию из select_handlers
-    items = await ensure_prep_items_loaded(state, pharmacy_repo)
+    # Справочник препаратов общий, в FSM — только его версия
+    catalog = await get_prep_catalog(state)
 
     # Строим ту самую клавиатуру с мульти-выбором
-    keyboard = build_multi_select_keyboard(items, [], "doc")
+    keyboard = get_multi_select_keyboard(catalog, [], "doc")
 
     # Загружаем историю из новой БД
-    last_report = await reports_db.get_last_doctor_report(user_name, doc_name)
+    last_report = await reports_db.get_last_doctor_report(user_name, doc_name, user_id=user_pk, doctor_id=doc_id)
     report_text = ""
 
     if last_report:
@@ -150,16 +146,15 @@ async def process_doctor(
 @router.callback_query(F.data.startswith("apothecary_"), PrescriptionFSM.choose_apothecary)
 async def process_apothecary(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     apt_id = int(callback.data.split("_")[-1])
 
-    apt = await pharmacy_repo.get_apothecary_by_id(apt_id)
+    apt = territory_index.get_apothecary(apt_id)
     if not apt:
         return await callback.answer("❌ Аптека не найдена", show_alert=True)
 
-    apt_name = getattr(apt, 'name', getattr(apt, 'pharmacy_name', 'Неизвестная аптека'))
+    apt_name = apt.name or 'Неизвестная аптека'
 
     await state.update_data(
         apt_id=apt_id,
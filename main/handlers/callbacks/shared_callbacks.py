@@ -1,16 +1,14 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 
-# DI Репозитории
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
-
 # Состояния
 from states.add.prescription_state import PrescriptionFSM
 from states.add.add_state import AddDoctor
 from utils.ui.ui_helper import safe_clear_state
+from handlers.add.select_handlers import get_prep_catalog
 
 # Клавиатуры
-from keyboard.inline import inline_buttons
+from keyboard.inline.inline_select import get_multi_select_keyboard
 
 
 router = Router()
@@ -23,8 +21,7 @@ router = Router()
 @router.callback_query(F.data.in_(["confirm_yes", "confirm_no"]))
 async def handle_confirmation(
         callback: types.CallbackQuery,
-        state: FSMContext,
-        pharmacy_repo: PharmacyRepository
+        state: FSMContext
 ):
     is_yes = (callback.data == "confirm_yes")
     current_state = await state.get_state()
@@ -40,14 +37,12 @@ async def handle_confirmation(
         await state.update_data(prefix="apt")
 
         if is_yes:
-            await state.set_state(PrescriptionFSM.choose_meds)
-
-            # Используем DI (никаких async for session!)
-            preps = await pharmacy_repo.get_preps()
-            keyboard = await inline_buttons.build_keyboard_from_items(
-                preps, prefix="apt", state=state, row_width=2
-            )
+            # Та же версия справочника и те же готовые клавиатуры, что у врачей
+            catalog = await get_prep_catalog(state)
+            await state.update_data(selected_items=[])
+            keyboard = get_multi_select_keyboard(catalog, [], "apt")
 
+            await state.set_state(PrescriptionFSM.choose_meds)
             await callback.message.edit_text(
                 "💊 Выберите препараты из списка:",
                 reply_markup=keyboard
@@ -22,8 +22,8 @@ async def start_command(
     await state.clear()
 
     # --- SENIOR LOGIC ---
-    # Получаем юзера напрямую (никаких async for session!)
-    user = await user_repo.get_user(user_id)
+    # Профиль из кеша (в базу — только при промахе)
+    user = await user_repo.get_profile(user_id)
 
     # Логика определения статуса
     # Если юзера нет в базе ORM -> он гость
@@ -5,6 +5,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 # 🔥 НОВЫЕ ЧИСТЫЕ ИМПОРТЫ РЕПОЗИТОРИЕВ
 from infrastructure.database.repo.user_repo import UserRepository
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.unit_of_work import commit_now, set_rollback_only
 
 from utils.config.config import config
 from utils.text.pw import hash_password, check_password as verify_password
@@ -100,6 +101,7 @@ async def check_password_handler(
 
     if verify_password(password_input, user.user_password):
         await user_repo.set_logged_in(user_id, True)
+        await commit_now(user_repo.session)
 
         # 🔥 МАГИЧЕСКАЯ СТРОЧКА: Сохраняем регион именно этого аккаунта в сессию!
         await state.update_data(user_region=user.region)
@@ -179,6 +181,7 @@ async def confirm_password(
 
     try:
         await user_repo.create_user(user_id, user_name, hashed_pw, region)
+        await commit_now(user_repo.session)
         await message.answer("✅ <b>Заявка отправлена!</b>\n\nВаш аккаунт находится на проверке у администратора.")
 
         # Уведомление админам
@@ -197,5 +200,6 @@ async def confirm_password(
 
         await state.clear()
     except Exception as e:
+        set_rollback_only(user_repo.session)
         await message.answer("❌ Ошибка регистрации. Попробуйте позже.")
         print(f"Registration Error: {e}")
\ No newline at end of file
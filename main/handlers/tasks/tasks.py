@@ -2,9 +2,11 @@ from aiogram import Router, F, types
 
 # 🔥 НОВЫЙ ИМПОРТ РЕПОЗИТОРИЯ
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.unit_of_work import commit_now
 
 # Импортируем генератор меню
 from keyboard.inline.menu_kb import get_main_menu_inline
+from utils.logger.logger_config import logger
 
 
 router = Router()
@@ -46,7 +48,13 @@ async def show_user_tasks(
         text += f"🔹 <b>Задача №{idx}</b>\n{task_text}\n➖➖➖➖➖➖\n"
 
     # 3. Самое важное: Отмечаем, что юзер это прочитал
-    await reports_db.mark_all_as_read(user_id)
+    try:
+        await reports_db.mark_all_as_read(user_id)
+        await commit_now(reports_db.session)
+    except Exception as e:
+        # Отметка не записалась — задачи все равно показываем, сессию освобождаем для меню ниже
+        logger.error(f"Error marking tasks as read for {user_id}: {e}")
+        await reports_db.session.rollback()
 
     # 4. Обновляем меню (чтобы убрать восклицательные знаки !!)
     new_menu = await get_main_menu_inline(user_id, reports_db)
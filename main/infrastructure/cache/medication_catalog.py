@@ -0,0 +1,113 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.models.pharmacy import Medication
+from utils.logger.logger_config import logger
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Одна версия справочника препаратов: порядок для клавиатуры + поиск имени по ID"""
+    version: int = 0
+    items: Tuple[Tuple[int, str], ...] = ()
+    names: Dict[int, str] = field(default_factory=dict)
+
+
+class MedicationCatalog:
+    """
+    Общий для всех агентов справочник препаратов с номером версии.
+    В FSM хранится только catalog_version и выбранные ID, имена берутся отсюда.
+    Несколько прошлых версий держим, чтобы агент, начавший выбор до перезагрузки
+    справочника, видел те же названия, что и на своей клавиатуре.
+    Справочник меняют прямо в базе, поэтому он перечитывается в фоне (start_refresh);
+    новая версия публикуется, только если состав изменился.
+    """
+    KEEP_VERSIONS = 4
+
+    def __init__(self):
+        self._current = CatalogSnapshot()
+        self._versions: "OrderedDict[int, CatalogSnapshot]" = OrderedDict()
+        self._load_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._current.version > 0
+
+    @property
+    def current(self) -> CatalogSnapshot:
+        return self._current
+
+    async def load(self, session_factory: async_sessionmaker) -> bool:
+        """Перечитывает справочник из базы. True — опубликована новая версия"""
+        async with self._load_lock:
+            async with session_factory() as session:
+                rows = (await session.execute(
+                    select(Medication.id, Medication.prep).order_by(Medication.prep)
+                )).all()
+
+            items = tuple((prep_id, name) for prep_id, name in rows if prep_id and name)
+            if self.loaded and items == self._current.items:
+                # Ничего не изменилось — версию не трогаем, кеши клавиатур остаются валидны
+                return False
+
+            snapshot = CatalogSnapshot(
+                version=self._current.version + 1,
+                items=items,
+                names=dict(items),
+            )
+
+            self._versions[snapshot.version] = snapshot
+            while len(self._versions) > self.KEEP_VERSIONS:
+                self._versions.popitem(last=False)
+            self._current = snapshot
+            logger.info(f"💊 Medication catalog v{snapshot.version} loaded: {len(items)} preps")
+            return True
+
+    def start_refresh(self, session_factory: async_sessionmaker, interval: float):
+        """Фоновая перезагрузка раз в interval секунд (0 — выключена)"""
+        if interval <= 0 or self._refresh_task is not None:
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_loop(session_factory, interval))
+
+    async def stop_refresh(self):
+        if self._refresh_task is None:
+            return
+        self._refresh_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._refresh_task
+        self._refresh_task = None
+
+    async def _refresh_loop(self, session_factory: async_sessionmaker, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(session_factory)
+            except Exception as e:
+                # Остаемся на текущей версии до следующей попытки
+                logger.error(f"❌ Medication catalog refresh failed: {e}")
+
+    def get(self, version: Optional[int] = None) -> CatalogSnapshot:
+        """Версия из FSM, если она еще в памяти, иначе текущая"""
+        if version is None:
+            return self._current
+        return self._versions.get(version, self._current)
+
+    def name(self, prep_id, version: Optional[int] = None) -> Optional[str]:
+        names = self.get(version).names
+        try:
+            return names.get(int(prep_id))
+        except (TypeError, ValueError):
+            return None
+
+    def names(self, prep_ids: Iterable, version: Optional[int] = None) -> List[str]:
+        return [self.name(prep_id, version) or f"ID {prep_id}" for prep_id in prep_ids]
+
+
+medication_catalog = MedicationCatalog()
@@ -0,0 +1,82 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils.logger.logger_config import logger
+
+
+class SingleFlight:
+    """
+    Склейка одинаковых одновременных запросов: пока запрос с ключом выполняется,
+    остальные вызовы с тем же ключом не идут в базу, а ждут его результат.
+    Это не кеш — после завершения запроса следующий вызов снова идет в базу.
+    Результат один на всех ждущих, поэтому склеивать можно только неизменяемые значения
+    (кортежи, NamedTuple из dto, скаляры), но не ORM-объекты и не списки.
+    """
+    # Как часто писать в лог статистику склейки
+    STATS_LOG_EVERY = 1000
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # calls — все вызовы, flights — реальные запросы, coalesced — вызовы, получившие чужой результат
+        self.stats = {"calls": 0, "flights": 0, "coalesced": 0}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._count("calls")
+
+        while key in self._inflight:
+            future = self._inflight[key]
+            self._count("coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили ведущий запрос, а не нас — выполняем сами
+                if not future.cancelled():
+                    raise
+                self.stats["coalesced"] -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку ведущего могут так и не прочитать, если ждущих не было
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self._count("flights")
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _count(self, counter: str):
+        self.stats[counter] += 1
+        if counter == "calls" and self.stats["calls"] % self.STATS_LOG_EVERY == 0:
+            logger.info(
+                f"🛬 Single-flight [{self.name}]: {self.stats['coalesced']}/{self.stats['calls']} calls coalesced, "
+                f"{self.stats['flights']} queries executed"
+            )
+
+
+def single_flight(group: SingleFlight):
+    """
+    Декоратор метода чтения репозитория: ключ — имя метода + аргументы.
+    Если у репозитория coalesce_reads = False (в этой сессии уже были записи),
+    запрос идет напрямую: чужой результат не увидит незакоммиченные данные.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if not getattr(self, "coalesce_reads", True):
+                return await method(self, *args, **kwargs)
+            key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+            return await group.run(key, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
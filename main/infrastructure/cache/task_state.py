@@ -0,0 +1,60 @@
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.models.reports import Task, UserTaskProgress
+from utils.logger.logger_config import logger
+
+
+class TaskState:
+    """
+    Состояние задач в памяти: отсортированные ID активных задач и last_task_id каждого юзера.
+    Счетчик непрочитанных для кнопки меню считается без запросов к БД.
+    Меняется только после commit (ReportRepository.add_task / mark_all_as_read).
+    """
+
+    def __init__(self):
+        self._active_ids: List[int] = []
+        self._last_seen: Dict[int, int] = {}
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def load(self, session_factory: async_sessionmaker):
+        async with session_factory() as session:
+            active_ids = (await session.execute(
+                select(Task.id).where(Task.is_active == True).order_by(Task.id)
+            )).scalars().all()
+            progress = (await session.execute(
+                select(UserTaskProgress.user_id, UserTaskProgress.last_task_id)
+            )).all()
+
+        self._active_ids = list(active_ids)
+        self._last_seen = {user_id: last_id or 0 for user_id, last_id in progress}
+        self._loaded = True
+        logger.info(f"📋 Task state loaded: {len(self._active_ids)} active tasks, {len(self._last_seen)} users")
+
+    def unread_count(self, user_id: int, last_seen: Optional[int] = None) -> int:
+        """Активные задачи с ID больше прочитанного (last_seen — незакоммиченное значение из текущей сессии)"""
+        if last_seen is None:
+            last_seen = self._last_seen.get(user_id, 0)
+        return len(self._active_ids) - bisect_right(self._active_ids, last_seen)
+
+    def max_active_id(self) -> int:
+        return self._active_ids[-1] if self._active_ids else 0
+
+    def add_task(self, task_id: int):
+        if not self._active_ids or task_id > self._active_ids[-1]:
+            self._active_ids.append(task_id)
+        elif task_id not in self._active_ids:
+            insort(self._active_ids, task_id)
+
+    def mark_read(self, user_id: int, last_task_id: int):
+        self._last_seen[user_id] = max(self._last_seen.get(user_id, 0), last_task_id)
+
+
+task_state = TaskState()
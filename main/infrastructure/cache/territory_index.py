@@ -0,0 +1,211 @@
+import asyncio
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.models.pharmacy import District, Road, LPU, Apothecary, Doctor, MainSpec
+from infrastructure.database.dto import DistrictRow, LpuRow, ApothecaryRow, DoctorRow
+from utils.logger.logger_config import logger
+
+
+def _sorted(items, attr: str) -> tuple:
+    # Тот же порядок, что ORDER BY в репозитории (NULL первыми)
+    return tuple(sorted(items, key=lambda x: (getattr(x, attr) is not None, getattr(x, attr) or "")))
+
+
+def _group(items, key_attr: str, sort_attr: str) -> Dict[int, tuple]:
+    groups: Dict[int, list] = {}
+    for item in items:
+        groups.setdefault(getattr(item, key_attr), []).append(item)
+    return {key: _sorted(group, sort_attr) for key, group in groups.items()}
+
+
+@dataclass(frozen=True)
+class TerritorySnapshot:
+    """
+    Неизменяемый срез иерархии регион → район → маршрут → ЛПУ/аптека → врач.
+    Никогда не меняется на месте: каждое изменение собирает новый срез (copy-on-write).
+    """
+    districts: Dict[int, DistrictRow] = field(default_factory=dict)
+    districts_by_region: Dict[str, Tuple[DistrictRow, ...]] = field(default_factory=dict)
+    roads: Dict[Tuple[str, int], int] = field(default_factory=dict)  # (район, номер) → road_id
+    lpus: Dict[int, LpuRow] = field(default_factory=dict)
+    lpus_by_road: Dict[int, Tuple[LpuRow, ...]] = field(default_factory=dict)
+    apothecaries: Dict[int, ApothecaryRow] = field(default_factory=dict)
+    apothecaries_by_road: Dict[int, Tuple[ApothecaryRow, ...]] = field(default_factory=dict)
+    doctors: Dict[int, DoctorRow] = field(default_factory=dict)
+    doctors_by_lpu: Dict[int, Tuple[DoctorRow, ...]] = field(default_factory=dict)
+    specs: Dict[int, str] = field(default_factory=dict)
+
+
+class TerritoryIndex:
+    """
+    Иерархия территорий в памяти: навигация по районам, маршрутам, ЛПУ и врачам
+    не ходит в базу. Срез строится при старте и подменяется атомарно одной ссылкой;
+    добавление ЛПУ/аптеки/врача обновляет его точечно после commit.
+    """
+
+    def __init__(self):
+        self._snapshot = TerritorySnapshot()
+        self._loaded = False
+        self._generation = 0  # Растет на каждое точечное изменение
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def generation(self) -> int:
+        """Версия данных: меняется при каждой загрузке и каждом точечном изменении"""
+        return self._generation
+
+    @property
+    def snapshot(self) -> TerritorySnapshot:
+        return self._snapshot
+
+    # ==================================================
+    # 🔄 ЗАГРУЗКА
+    # ==================================================
+
+    async def load(self, session_factory: async_sessionmaker):
+        """Полная перестройка среза из базы (при старте или после ручных правок справочников)"""
+        async with self._load_lock:
+            while True:
+                generation = self._generation
+                snapshot = await self._build(session_factory)
+                # Пока читали, пришло точечное изменение — оно могло не попасть в срез, читаем заново
+                if generation == self._generation:
+                    break
+
+            self._snapshot = snapshot
+            self._generation += 1
+            self._loaded = True
+            logger.info(
+                f"🗺 Territory index loaded: {len(snapshot.districts)} districts, {len(snapshot.roads)} roads, "
+                f"{len(snapshot.lpus)} LPU, {len(snapshot.apothecaries)} apothecaries, {len(snapshot.doctors)} doctors"
+            )
+
+    @staticmethod
+    async def _build(session_factory: async_sessionmaker) -> TerritorySnapshot:
+        async with session_factory() as session:
+            districts = [
+                DistrictRow(d.id, d.name, d.region)
+                for d in (await session.execute(select(District.id, District.name, District.region))).all()
+            ]
+            roads = (await session.execute(select(Road.district_name, Road.road_num, Road.road_id))).all()
+            lpus = [
+                LpuRow(*row) for row in (await session.execute(
+                    select(LPU.lpu_id, LPU.road_id, LPU.pharmacy_name, LPU.pharmacy_url)
+                )).all()
+            ]
+            apothecaries = [
+                ApothecaryRow(*row) for row in (await session.execute(
+                    select(Apothecary.id, Apothecary.road_id, Apothecary.name, Apothecary.url)
+                )).all()
+            ]
+            doctors = [
+                DoctorRow(*row) for row in (await session.execute(
+                    select(Doctor.id, Doctor.lpu_id, Doctor.doctor, Doctor.spec_id, Doctor.numb, MainSpec.spec)
+                    .outerjoin(Doctor.specialty)
+                )).all()
+            ]
+            specs = dict((await session.execute(select(MainSpec.id, MainSpec.spec))).all())
+
+        road_map = {}
+        for district, road_num, road_id in roads:
+            # roads.district_name — TEXT-колонка с ID района; при дублях побеждает первый
+            road_map.setdefault((str(district), road_num), road_id)
+
+        return TerritorySnapshot(
+            districts={d.id: d for d in districts},
+            districts_by_region=_group(districts, "region", "name"),
+            roads=road_map,
+            lpus={lpu.lpu_id: lpu for lpu in lpus},
+            lpus_by_road=_group(lpus, "road_id", "pharmacy_name"),
+            apothecaries={apt.id: apt for apt in apothecaries},
+            apothecaries_by_road=_group(apothecaries, "road_id", "name"),
+            doctors={doc.id: doc for doc in doctors},
+            doctors_by_lpu=_group(doctors, "lpu_id", "doctor"),
+            specs=specs,
+        )
+
+    # ==================================================
+    # 🔍 ЧТЕНИЕ
+    # ==================================================
+
+    def get_districts_by_region(self, region: str) -> Tuple[DistrictRow, ...]:
+        return self._snapshot.districts_by_region.get(region, ())
+
+    def get_district(self, district_id: int) -> Optional[DistrictRow]:
+        return self._snapshot.districts.get(district_id)
+
+    def get_road_id(self, district_id: int, road_num: int) -> Optional[int]:
+        return self._snapshot.roads.get((str(district_id), road_num))
+
+    def get_lpus_by_road(self, road_id: int) -> Tuple[LpuRow, ...]:
+        return self._snapshot.lpus_by_road.get(road_id, ())
+
+    def get_lpu(self, lpu_id: int) -> Optional[LpuRow]:
+        return self._snapshot.lpus.get(lpu_id)
+
+    def get_apothecaries_by_road(self, road_id: int) -> Tuple[ApothecaryRow, ...]:
+        return self._snapshot.apothecaries_by_road.get(road_id, ())
+
+    def get_apothecary(self, apt_id: int) -> Optional[ApothecaryRow]:
+        return self._snapshot.apothecaries.get(apt_id)
+
+    def get_doctors_by_lpu(self, lpu_id: int) -> Tuple[DoctorRow, ...]:
+        return self._snapshot.doctors_by_lpu.get(lpu_id, ())
+
+    def get_doctor(self, doc_id: int) -> Optional[DoctorRow]:
+        return self._snapshot.doctors.get(doc_id)
+
+    def get_spec_name(self, spec_id: Optional[int]) -> str:
+        return self._snapshot.specs.get(spec_id) or "Не указана"
+
+    # ==================================================
+    # ✍️ ТОЧЕЧНЫЕ ИЗМЕНЕНИЯ (вызываются после commit)
+    # ==================================================
+
+    def add_lpu(self, lpu: LpuRow):
+        snap = self._snapshot
+        siblings = [x for x in snap.lpus_by_road.get(lpu.road_id, ()) if x.lpu_id != lpu.lpu_id]
+        self._swap(replace(
+            snap,
+            lpus={**snap.lpus, lpu.lpu_id: lpu},
+            lpus_by_road={**snap.lpus_by_road, lpu.road_id: _sorted(siblings + [lpu], "pharmacy_name")},
+        ))
+
+    def add_apothecary(self, apt: ApothecaryRow):
+        snap = self._snapshot
+        siblings = [x for x in snap.apothecaries_by_road.get(apt.road_id, ()) if x.id != apt.id]
+        self._swap(replace(
+            snap,
+            apothecaries={**snap.apothecaries, apt.id: apt},
+            apothecaries_by_road={**snap.apothecaries_by_road, apt.road_id: _sorted(siblings + [apt], "name")},
+        ))
+
+    def add_doctor(self, doctor: DoctorRow):
+        snap = self._snapshot
+        if doctor.spec is None:
+            doctor = doctor._replace(spec=snap.specs.get(doctor.spec_id))
+        siblings = [x for x in snap.doctors_by_lpu.get(doctor.lpu_id, ()) if x.id != doctor.id]
+        self._swap(replace(
+            snap,
+            doctors={**snap.doctors, doctor.id: doctor},
+            doctors_by_lpu={**snap.doctors_by_lpu, doctor.lpu_id: _sorted(siblings + [doctor], "doctor")},
+        ))
+
+    def add_spec(self, spec_id: int, name: str):
+        snap = self._snapshot
+        self._swap(replace(snap, specs={**snap.specs, spec_id: name}))
+
+    def _swap(self, snapshot: TerritorySnapshot):
+        self._generation += 1
+        self._snapshot = snapshot
+
+
+territory_index = TerritoryIndex()
@@ -0,0 +1,83 @@
+import itertools
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from utils.config.config import config
+
+
+class UserProfile(NamedTuple):
+    """Все, что хэндлерам и фильтрам нужно о пользователе (без пароля)"""
+    id: int
+    user_id: int
+    user_name: Optional[str]
+    region: Optional[str]
+    is_approved: bool
+    logged_in: bool
+
+
+class UserProfileCache:
+    """
+    Профили пользователей в памяти процесса, ключ — Telegram ID.
+    Запись живет ttl секунд; UserRepository сбрасывает ее при любом изменении пользователя.
+    Отсутствие пользователя тоже кешируется (гость, нажимающий /start).
+    Поколение пользователя растет при каждом сбросе: читатель запоминает его до запроса в базу,
+    и put() с устаревшим поколением отбрасывается — иначе ответ, прочитанный до изменения,
+    вернул бы в кеш старый профиль. Записей не больше max_entries: при переполнении сначала
+    уходят просроченные, затем самые старые.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[int, Tuple[float, Optional[UserProfile]]] = {}
+        self._generations: Dict[int, int] = {}
+        self._counter = itertools.count(1)
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "stale_puts": 0}
+
+    def get(self, telegram_id: int) -> Tuple[bool, Optional[UserProfile]]:
+        """(найдено в кеше, профиль или None)"""
+        entry = self._entries.get(telegram_id)
+        if entry is None or entry[0] < time.monotonic():
+            self.stats["misses"] += 1
+            return False, None
+        self.stats["hits"] += 1
+        return True, entry[1]
+
+    def generation(self, telegram_id: int) -> int:
+        """Запомнить перед запросом в базу и передать в put()"""
+        return self._generations.get(telegram_id, 0)
+
+    def put(self, telegram_id: int, profile: Optional[UserProfile], generation: int) -> bool:
+        """False — пока шел запрос, пользователя сбросили; такой профиль не кешируем"""
+        if self._generations.get(telegram_id, 0) != generation:
+            self.stats["stale_puts"] += 1
+            return False
+
+        self._entries.pop(telegram_id, None)
+        self._entries[telegram_id] = (time.monotonic() + self.ttl, profile)
+        if len(self._entries) > self.max_entries:
+            self._prune()
+        return True
+
+    def invalidate(self, telegram_id: int):
+        self.stats["invalidations"] += 1
+        # Значения счетчика не повторяются: чтение, начатое до любого сброса, уже не совпадет
+        self._generations[telegram_id] = next(self._counter)
+        self._entries.pop(telegram_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _prune(self):
+        now = time.monotonic()
+        for telegram_id in [tid for tid, (expires, _) in self._entries.items() if expires < now]:
+            del self._entries[telegram_id]
+        # Просроченных не хватило — вытесняем самые давние записи (dict хранит порядок вставки)
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+user_cache = UserProfileCache(
+    ttl=getattr(config, "user_cache_ttl", 300),
+    max_entries=getattr(config, "user_cache_max_entries", 10_000),
+)
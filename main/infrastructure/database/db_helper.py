@@ -1,7 +1,18 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from utils.config.config import config
+from utils.logger.logger_config import logger
 
-from infrastructure.database.models.base import Base
+from infrastructure.database.migrations.migrator import upgrade_to_head
+from infrastructure.database.sqlite_profile import SQLiteProfile, create_sqlite_engine
+from infrastructure.database.statement_cache import track_compiled_cache
+from infrastructure.database.report_queue import ReportWriteQueue
 import infrastructure.database.models.users
 import infrastructure.database.models.pharmacy
 import infrastructure.database.models.reports
@@ -9,11 +20,105 @@ import infrastructure.database.models.reports
 
 class DatabaseHelper:
     def __init__(self):
-        self.engine = create_async_engine(config.url_database, echo=False)
+        # WAL, busy_timeout, кеш и размер пула — из конфига (sqlite_*), иначе дефолты профиля
+        self.profile = SQLiteProfile.from_config(config)
+        self.engine = create_sqlite_engine(config.url_database, self.profile, echo=False)
         self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+        # Доля запросов, SQL которых взят из кеша компиляции (периодически пишется в лог)
+        self.compiled_cache = track_compiled_cache(self.engine, "main")
+
+        # 📊 Отдельный read-only движок для тяжелых выгрузок (админка).
+        # Свой маленький пул + query_only: экспорт не отнимает соединения у агентов и не берет write-локи.
+        # Если задан export_snapshot_path — читаем из снапшота, а не из боевого файла.
+        self.snapshot_path: Optional[str] = getattr(config, "export_snapshot_path", None)
+        self.snapshot_max_age: float = getattr(config, "export_snapshot_max_age", 300)
+        self._snapshot_taken_at = 0.0
+        self._snapshot_lock = asyncio.Lock()
+
+        self.read_profile = self.profile.with_overrides(
+            journal_mode=None,
+            query_only=True,
+            pool_size=getattr(config, "export_pool_size", 2),
+            max_overflow=0,
+        )
+        self.read_engine = create_sqlite_engine(self._read_only_url(), self.read_profile, echo=False)
+        self.read_session_factory = async_sessionmaker(self.read_engine, expire_on_commit=False)
+        self.read_compiled_cache = track_compiled_cache(self.read_engine, "export")
+
+        # 🧾 Опциональная write-behind очередь отчетов (report_write_behind = True в конфиге)
+        self.report_queue: Optional[ReportWriteQueue] = None
+        if getattr(config, "report_write_behind", False):
+            self.report_queue = ReportWriteQueue(
+                self.session_factory,
+                spool_path=getattr(config, "report_spool_path", "data/report_spool.jsonl"),
+                max_batch=getattr(config, "report_batch_size", 100),
+                max_delay=getattr(config, "report_batch_delay", 0.05),
+            )
+
+    def _source_path(self) -> Optional[str]:
+        url = make_url(config.url_database)
+        if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+            return None
+        return url.database
+
+    def _read_only_url(self) -> str:
+        """URI-соединение с mode=ro к основному файлу или к снапшоту"""
+        source = self._source_path()
+        if source is None:
+            return config.url_database
+
+        path = os.path.abspath(self.snapshot_path or source)
+        url = make_url(config.url_database).set(
+            database=f"file:{path}",
+            query={"mode": "ro", "uri": "true"}
+        )
+        return url.render_as_string(hide_password=False)
 
     async def init_db(self):
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        """Применяет недостающие миграции (схема больше не пересоздаётся через create_all)"""
+        await upgrade_to_head(self.engine)
+        if self.snapshot_path:
+            await self.refresh_snapshot(force=True)
+
+    # ==================================================
+    # 📸 СНАПШОТ ДЛЯ ВЫГРУЗОК
+    # ==================================================
+
+    async def refresh_snapshot(self, force: bool = False):
+        """
+        Обновляет копию базы для выгрузок через SQLite backup API (онлайн, без остановки записи).
+        Без force копия обновляется не чаще, чем раз в export_snapshot_max_age секунд.
+        """
+        source = self._source_path()
+        if not self.snapshot_path or source is None:
+            return
+
+        async with self._snapshot_lock:
+            if not force and time.monotonic() - self._snapshot_taken_at < self.snapshot_max_age:
+                return
+
+            tmp_path = f"{self.snapshot_path}.tmp"
+            await asyncio.to_thread(_backup_database, source, tmp_path)
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Старые соединения смотрят на удаленный inode — переоткрываем пул
+            await self.read_engine.dispose()
+            self._snapshot_taken_at = time.monotonic()
+            logger.info(f"📸 Export snapshot refreshed: {self.snapshot_path}")
+
+
+def _backup_database(source: str, target: str):
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        # За один шаг: пошаговый backup начинается заново после каждой записи в источник
+        # через другое соединение и при активном агенте может не закончиться никогда.
+        # В WAL-режиме чтение источника писателей не блокирует
+        src.backup(dst, pages=-1)
+        # Снапшот только читается — WAL ему не нужен (и мешает открытию с mode=ro)
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
 
 db_helper = DatabaseHelper()
\ No newline at end of file
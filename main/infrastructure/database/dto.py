@@ -0,0 +1,117 @@
+from typing import NamedTuple, Optional, Protocol
+
+
+# ==================================================
+# 📦 ЛЕГКИЕ СТРОКИ ДЛЯ READ-ONLY ПУТЕЙ
+# NamedTuple: только нужные колонки, без identity map и отслеживания изменений.
+# Имена полей совпадают с ORM-моделями, поэтому хэндлеры читают их так же.
+# ==================================================
+
+class KeyboardItem(Protocol):
+    """Все, что нужно кнопке: ID для callback_data и подпись"""
+
+    @property
+    def button_id(self) -> int: ...
+
+    @property
+    def label(self) -> str: ...
+
+
+class DistrictRow(NamedTuple):
+    id: int
+    name: str
+    region: str
+
+    @property
+    def button_id(self) -> int:
+        return self.id
+
+    @property
+    def label(self) -> str:
+        return self.name or str(self.id)
+
+
+class RoadRow(NamedTuple):
+    road_num: int
+
+    @property
+    def button_id(self) -> int:
+        return self.road_num
+
+    @property
+    def label(self) -> str:
+        return f"Маршрут {self.road_num}"
+
+
+class LpuRow(NamedTuple):
+    lpu_id: int
+    road_id: int
+    pharmacy_name: str
+    pharmacy_url: Optional[str]
+
+    @property
+    def button_id(self) -> int:
+        return self.lpu_id
+
+    @property
+    def label(self) -> str:
+        return self.pharmacy_name or str(self.lpu_id)
+
+
+class ApothecaryRow(NamedTuple):
+    id: int
+    road_id: int
+    name: str
+    url: Optional[str]
+
+    @property
+    def button_id(self) -> int:
+        return self.id
+
+    @property
+    def label(self) -> str:
+        return self.name or str(self.id)
+
+
+class DoctorRow(NamedTuple):
+    id: int
+    lpu_id: int
+    doctor: str
+    spec_id: Optional[int]
+    numb: Optional[int]
+    spec: Optional[str] = None  # Название специальности (Doctor.specialty.spec)
+
+    @property
+    def button_id(self) -> int:
+        return self.id
+
+    @property
+    def label(self) -> str:
+        name = self.doctor or "Врач"
+        return f"{name} ({self.spec})" if self.spec else name
+
+
+class SpecRow(NamedTuple):
+    id: int
+    spec: str
+
+    @property
+    def button_id(self) -> int:
+        return self.id
+
+    @property
+    def label(self) -> str:
+        return self.spec or str(self.id)
+
+
+class PrepRow(NamedTuple):
+    id: int
+    prep: str
+
+    @property
+    def button_id(self) -> int:
+        return self.id
+
+    @property
+    def label(self) -> str:
+        return self.prep or str(self.id)
@@ -0,0 +1,32 @@
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class LazySession:
+    """
+    Прокси для AsyncSession: настоящая сессия создается только при первом обращении.
+    Репозитории работают с ним как с обычной сессией, а апдейты, которые не ходят
+    в базу (меню, отмена, навигация без БД), не создают сессию вовсе.
+    """
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory: async_sessionmaker):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def materialized(self) -> bool:
+        return self._session is not None
+
+    def _get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
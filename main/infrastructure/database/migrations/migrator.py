@@ -0,0 +1,107 @@
+from datetime import datetime
+from types import ModuleType
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.logger.logger_config import logger
+
+# Версии подключаем явно и СТРОГО по порядку
+from infrastructure.database.migrations.versions import (
+    v0001_baseline,
+    v0002_report_indexes,
+    v0003_report_foreign_keys,
+    v0004_apothecary_int_quantities,
+    v0005_write_behind_state,
+    v0006_doctor_spec_fk,
+)
+
+
+MIGRATIONS: List[ModuleType] = [
+    v0001_baseline,
+    v0002_report_indexes,
+    v0003_report_foreign_keys,
+    v0004_apothecary_int_quantities,
+    v0005_write_behind_state,
+    v0006_doctor_spec_fk,
+]
+
+VERSION_TABLE = "schema_version"
+
+
+def _check_order(migrations: List[ModuleType]) -> int:
+    """Защита от дублей и перепутанного порядка версий. Возвращает HEAD."""
+    last = 0
+    for module in migrations:
+        if module.VERSION <= last:
+            raise RuntimeError(f"Migration order is broken at {module.__name__} (version {module.VERSION})")
+        last = module.VERSION
+    return last
+
+
+HEAD = _check_order(MIGRATIONS)
+
+
+# ============================================================
+# 🔢 ТАБЛИЦА ВЕРСИЙ
+# ============================================================
+
+def _current_version(conn: Connection) -> int:
+    """Один запрос: максимальная применённая версия (0 — таблицы ещё нет)"""
+    try:
+        return conn.execute(text(f"SELECT MAX(version) FROM {VERSION_TABLE}")).scalar() or 0
+    except OperationalError:
+        return 0
+
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version INTEGER NOT NULL PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at DATETIME NOT NULL)"
+    ))
+
+
+def _apply(conn: Connection, module: ModuleType):
+    module.upgrade(conn)
+    conn.execute(
+        text(f"INSERT INTO {VERSION_TABLE} (version, description, applied_at) VALUES (:v, :d, :t)"),
+        {"v": module.VERSION, "d": module.DESCRIPTION, "t": datetime.now()}
+    )
+
+
+# ============================================================
+# 🚀 ЗАПУСК МИГРАЦИЙ
+# ============================================================
+
+async def upgrade_to_head(engine: AsyncEngine) -> int:
+    """
+    Доводит схему до HEAD. Если база уже актуальна — стоит ровно один SELECT.
+    Каждая версия применяется в своей транзакции вместе с записью в schema_version,
+    поэтому упавшая миграция повторится при следующем старте.
+    """
+    async with engine.connect() as conn:
+        current = await conn.run_sync(_current_version)
+
+    if current >= HEAD:
+        logger.info(f"🗄 Database schema is up to date (version {current})")
+        return current
+
+    async with engine.begin() as conn:
+        await conn.run_sync(_ensure_version_table)
+
+    for module in MIGRATIONS:
+        if module.VERSION <= current:
+            continue
+
+        logger.info(f"🛠 Applying migration {module.VERSION}: {module.DESCRIPTION}")
+        async with engine.begin() as conn:
+            await conn.run_sync(_apply, module)
+        current = module.VERSION
+
+    logger.info(f"✅ Database schema upgraded to version {current}")
+    return current
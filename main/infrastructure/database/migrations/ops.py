@@ -0,0 +1,48 @@
+from typing import Iterable
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+# ============================================================
+# 🧰 ХЕЛПЕРЫ ДЛЯ МИГРАЦИЙ (SQLite)
+# ============================================================
+
+def execute_all(conn: Connection, statements: Iterable[str]):
+    """Выполняет список DDL/DML выражений по очереди"""
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def has_table(conn: Connection, table: str) -> bool:
+    stmt = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name")
+    return conn.execute(stmt, {"name": table}).first() is not None
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    """Проверяет наличие колонки (SQLite не умеет ADD COLUMN IF NOT EXISTS)"""
+    rows = conn.execute(text(f"PRAGMA table_info('{table}')")).all()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str):
+    """Идемпотентный ALTER TABLE ... ADD COLUMN"""
+    if not has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def run_in_batches(conn: Connection, table: str, statement: str, batch_size: int = 5000, pk: str = "id"):
+    """
+    Выполняет UPDATE/INSERT ... WHERE {pk} BETWEEN :lo AND :hi диапазонами первичного ключа.
+    Каждый шаг — ограниченный по объему оператор (память и временные B-деревья SQLite не растут
+    с размером таблицы). Но все шаги идут в транзакции версии (migrator: engine.begin() на версию):
+    write-блокировка и журнал держатся до конца миграции. Так и задумано — бэкфилл атомарен
+    вместе с записью в schema_version и при падении повторяется целиком.
+    """
+    bounds = conn.execute(text(f"SELECT MIN({pk}), MAX({pk}) FROM {table}")).first()
+    if not bounds or bounds[0] is None:
+        return
+
+    low, high = bounds
+    stmt = text(statement)
+    for start in range(low, high + 1, batch_size):
+        conn.execute(stmt, {"lo": start, "hi": start + batch_size - 1})
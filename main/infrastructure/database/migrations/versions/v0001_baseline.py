@@ -0,0 +1,156 @@
+"""
+Базовая схема — ровно то, что раньше создавал Base.metadata.create_all.
+IF NOT EXISTS позволяет «принять» уже существующую боевую базу без изменений.
+"""
+from sqlalchemy.engine import Connection
+from infrastructure.database.migrations.ops import execute_all
+
+VERSION = 1
+DESCRIPTION = "baseline schema"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER NOT NULL,
+        user_id BIGINT NOT NULL,
+        user_name VARCHAR,
+        user_password VARCHAR,
+        region VARCHAR,
+        join_date DATETIME NOT NULL,
+        logged_in BOOLEAN NOT NULL,
+        is_approved BOOLEAN NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS districts (
+        id INTEGER NOT NULL,
+        name VARCHAR,
+        region VARCHAR,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS roads (
+        road_id INTEGER NOT NULL,
+        district_name VARCHAR,
+        road_num INTEGER,
+        PRIMARY KEY (road_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lpu (
+        lpu_id INTEGER NOT NULL,
+        road_id INTEGER,
+        pharmacy_name VARCHAR,
+        pharmacy_url VARCHAR,
+        PRIMARY KEY (lpu_id),
+        FOREIGN KEY(road_id) REFERENCES roads (road_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS doctors (
+        id INTEGER NOT NULL,
+        lpu_id INTEGER,
+        doctor VARCHAR,
+        spec_id INTEGER,
+        numb INTEGER,
+        birthdate VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(lpu_id) REFERENCES lpu (lpu_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS main_specs (
+        id INTEGER NOT NULL,
+        spec VARCHAR,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS medication (
+        id INTEGER NOT NULL,
+        prep VARCHAR,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS apothecary (
+        id INTEGER NOT NULL,
+        road_id INTEGER,
+        name VARCHAR,
+        url VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(road_id) REFERENCES roads (road_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS main_reports (
+        id INTEGER NOT NULL,
+        user VARCHAR NOT NULL,
+        district VARCHAR NOT NULL,
+        road INTEGER NOT NULL,
+        lpu VARCHAR NOT NULL,
+        doc_name VARCHAR NOT NULL,
+        doc_spec VARCHAR NOT NULL,
+        doc_num VARCHAR,
+        term VARCHAR NOT NULL,
+        commentary TEXT,
+        date DATETIME NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS detailed_report (
+        id INTEGER NOT NULL,
+        report_id INTEGER NOT NULL,
+        prep VARCHAR NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(report_id) REFERENCES main_reports (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS apothecary_report (
+        id INTEGER NOT NULL,
+        user VARCHAR NOT NULL,
+        district VARCHAR NOT NULL,
+        road INTEGER NOT NULL,
+        apothecary VARCHAR NOT NULL,
+        commentary TEXT,
+        date DATETIME NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS apothecary_detailed_report (
+        id INTEGER NOT NULL,
+        report_id INTEGER NOT NULL,
+        prep VARCHAR NOT NULL,
+        request VARCHAR NOT NULL,
+        remaining VARCHAR NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(report_id) REFERENCES apothecary_report (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        created_at DATETIME NOT NULL,
+        is_active BOOLEAN NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_task_progress (
+        user_id INTEGER NOT NULL,
+        last_task_id INTEGER NOT NULL,
+        PRIMARY KEY (user_id)
+    )
+    """,
+]
+
+
+def upgrade(conn: Connection):
+    execute_all(conn, STATEMENTS)
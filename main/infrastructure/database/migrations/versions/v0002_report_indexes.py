@@ -0,0 +1,36 @@
+"""
+Индексы под реальные пути доступа: выгрузки за период, последний отчет по врачу,
+навигация район → маршрут → ЛПУ/аптека → врач и логин по имени.
+"""
+from sqlalchemy.engine import Connection
+from infrastructure.database.migrations.ops import execute_all
+
+VERSION = 2
+DESCRIPTION = "secondary indexes for reports and lookups"
+
+STATEMENTS = [
+    # Отчеты по врачам
+    "CREATE INDEX IF NOT EXISTS ix_main_reports_date ON main_reports (date)",
+    "CREATE INDEX IF NOT EXISTS ix_main_reports_user_date ON main_reports (user, date)",
+    "CREATE INDEX IF NOT EXISTS ix_main_reports_user_doc_date ON main_reports (user, doc_name, date)",
+    "CREATE INDEX IF NOT EXISTS ix_detailed_report_report_id ON detailed_report (report_id)",
+
+    # Отчеты по аптекам
+    "CREATE INDEX IF NOT EXISTS ix_apothecary_report_date ON apothecary_report (date)",
+    "CREATE INDEX IF NOT EXISTS ix_apothecary_report_user_date ON apothecary_report (user, date)",
+    "CREATE INDEX IF NOT EXISTS ix_apothecary_detailed_report_report_id ON apothecary_detailed_report (report_id)",
+
+    # Справочники
+    "CREATE INDEX IF NOT EXISTS ix_roads_district_road_num ON roads (district_name, road_num)",
+    "CREATE INDEX IF NOT EXISTS ix_lpu_road_id ON lpu (road_id)",
+    "CREATE INDEX IF NOT EXISTS ix_apothecary_road_id ON apothecary (road_id)",
+    "CREATE INDEX IF NOT EXISTS ix_doctors_lpu_id ON doctors (lpu_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_user_name ON users (user_name)",
+
+    # Свежая статистика для планировщика
+    "ANALYZE",
+]
+
+
+def upgrade(conn: Connection):
+    execute_all(conn, STATEMENTS)
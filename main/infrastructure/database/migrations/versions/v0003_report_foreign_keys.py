@@ -0,0 +1,96 @@
+"""
+Целочисленные ссылки вместо строк в отчетах по врачам.
+Старые строковые колонки остаются (история и фолбэк), новые заполняются пачками.
+"""
+from sqlalchemy.engine import Connection
+from infrastructure.database.migrations.ops import add_column, execute_all, run_in_batches
+
+VERSION = 3
+DESCRIPTION = "foreign key ids in doctor reports"
+
+BACKFILL_MAIN_REPORTS = [
+    # Порядок важен: lpu_id ищется через district_id, doctor_id — через lpu_id
+    """
+    UPDATE main_reports
+    SET user_id = (SELECT MIN(u.id) FROM users u WHERE u.user_name = main_reports.user)
+    WHERE id BETWEEN :lo AND :hi AND user_id IS NULL
+    """,
+    """
+    UPDATE main_reports
+    SET district_id = (SELECT MIN(d.id) FROM districts d WHERE d.name = main_reports.district)
+    WHERE id BETWEEN :lo AND :hi AND district_id IS NULL
+    """,
+    """
+    UPDATE main_reports
+    SET lpu_id = COALESCE(
+        (SELECT MIN(l.lpu_id) FROM lpu l JOIN roads r ON r.road_id = l.road_id
+         WHERE l.pharmacy_name = main_reports.lpu
+           AND r.road_num = main_reports.road
+           AND r.district_name = main_reports.district_id),
+        (SELECT MIN(l.lpu_id) FROM lpu l WHERE l.pharmacy_name = main_reports.lpu)
+    )
+    WHERE id BETWEEN :lo AND :hi AND lpu_id IS NULL
+    """,
+    """
+    UPDATE main_reports
+    SET doctor_id = (SELECT MIN(d.id) FROM doctors d
+                     WHERE d.doctor = main_reports.doc_name AND d.lpu_id = main_reports.lpu_id)
+    WHERE id BETWEEN :lo AND :hi AND doctor_id IS NULL
+    """,
+    """
+    UPDATE main_reports
+    SET spec_id = (SELECT MIN(s.id) FROM main_specs s WHERE s.spec = main_reports.doc_spec)
+    WHERE id BETWEEN :lo AND :hi AND spec_id IS NULL
+    """,
+]
+
+BACKFILL_DETAILED_REPORT = """
+    UPDATE detailed_report
+    SET medication_id = (SELECT MIN(m.id) FROM medication m WHERE m.prep = detailed_report.prep)
+    WHERE id BETWEEN :lo AND :hi AND medication_id IS NULL
+"""
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_main_reports_user_id_doctor_date ON main_reports (user_id, doctor_id, date)",
+    "CREATE INDEX IF NOT EXISTS ix_detailed_report_medication_id ON detailed_report (medication_id)",
+
+    # Путь для Excel: те же колонки, что и раньше, но имена берутся через integer-join.
+    # COALESCE — для старых строк, которые не удалось сопоставить со справочником.
+    "DROP VIEW IF EXISTS v_main_report_export",
+    """
+    CREATE VIEW v_main_report_export AS
+    SELECT
+        r.id AS id,
+        r.date AS created_at,
+        COALESCE(u.user_name, r.user) AS user_name,
+        COALESCE(d.name, r.district) AS district,
+        r.road AS road,
+        COALESCE(l.pharmacy_name, r.lpu) AS lpu,
+        COALESCE(doc.doctor, r.doc_name) AS doctor_name,
+        COALESCE(s.spec, r.doc_spec) AS doctor_spec,
+        r.doc_num AS doctor_number,
+        r.term AS term,
+        r.commentary AS commentary
+    FROM main_reports r
+    LEFT JOIN users u ON u.id = r.user_id
+    LEFT JOIN districts d ON d.id = r.district_id
+    LEFT JOIN lpu l ON l.lpu_id = r.lpu_id
+    LEFT JOIN doctors doc ON doc.id = r.doctor_id
+    LEFT JOIN main_specs s ON s.id = r.spec_id
+    """,
+]
+
+
+def upgrade(conn: Connection):
+    add_column(conn, "main_reports", "user_id", "INTEGER REFERENCES users (id)")
+    add_column(conn, "main_reports", "district_id", "INTEGER REFERENCES districts (id)")
+    add_column(conn, "main_reports", "lpu_id", "INTEGER REFERENCES lpu (lpu_id)")
+    add_column(conn, "main_reports", "doctor_id", "INTEGER REFERENCES doctors (id)")
+    add_column(conn, "main_reports", "spec_id", "INTEGER REFERENCES main_specs (id)")
+    add_column(conn, "detailed_report", "medication_id", "INTEGER REFERENCES medication (id)")
+
+    for statement in BACKFILL_MAIN_REPORTS:
+        run_in_batches(conn, "main_reports", statement)
+    run_in_batches(conn, "detailed_report", BACKFILL_DETAILED_REPORT)
+
+    execute_all(conn, STATEMENTS)
@@ -0,0 +1,54 @@
+"""
+apothecary_detailed_report.request/remaining: String -> INTEGER с CHECK (>= 0).
+SQLite не умеет ALTER COLUMN, поэтому таблица пересобирается, строки копируются пачками.
+"""
+from sqlalchemy.engine import Connection
+from infrastructure.database.migrations.ops import execute_all, has_table, run_in_batches
+
+VERSION = 4
+DESCRIPTION = "integer quantities in apothecary detailed report"
+
+CREATE_NEW_TABLE = """
+    CREATE TABLE apothecary_detailed_report_new (
+        id INTEGER NOT NULL,
+        report_id INTEGER NOT NULL,
+        prep VARCHAR NOT NULL,
+        request INTEGER NOT NULL DEFAULT 0,
+        remaining INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (id),
+        FOREIGN KEY(report_id) REFERENCES apothecary_report (id) ON DELETE CASCADE,
+        CONSTRAINT ck_apothecary_detailed_report_request CHECK (request >= 0),
+        CONSTRAINT ck_apothecary_detailed_report_remaining CHECK (remaining >= 0)
+    )
+"""
+
+# Переносятся только целые неотрицательные числа (одни цифры, пробелы по краям не в счет).
+# Все остальное — пусто, "-", отрицательные, "1.5", "12шт" — становится 0, строка остается
+COPY_BATCH = """
+    INSERT INTO apothecary_detailed_report_new (id, report_id, prep, request, remaining)
+    SELECT
+        id, report_id, prep,
+        CASE WHEN trim(request) <> '' AND trim(request) NOT GLOB '*[^0-9]*'
+            THEN CAST(trim(request) AS INTEGER) ELSE 0 END,
+        CASE WHEN trim(remaining) <> '' AND trim(remaining) NOT GLOB '*[^0-9]*'
+            THEN CAST(trim(remaining) AS INTEGER) ELSE 0 END
+    FROM apothecary_detailed_report
+    WHERE id BETWEEN :lo AND :hi
+"""
+
+SWAP_TABLES = [
+    "DROP TABLE apothecary_detailed_report",
+    "ALTER TABLE apothecary_detailed_report_new RENAME TO apothecary_detailed_report",
+    "CREATE INDEX IF NOT EXISTS ix_apothecary_detailed_report_report_id ON apothecary_detailed_report (report_id)",
+    "CREATE INDEX IF NOT EXISTS ix_apothecary_detailed_report_prep ON apothecary_detailed_report (prep)",
+]
+
+
+def upgrade(conn: Connection):
+    # Остаток от прерванной попытки
+    if has_table(conn, "apothecary_detailed_report_new"):
+        conn.exec_driver_sql("DROP TABLE apothecary_detailed_report_new")
+
+    execute_all(conn, [CREATE_NEW_TABLE])
+    run_in_batches(conn, "apothecary_detailed_report", COPY_BATCH)
+    execute_all(conn, SWAP_TABLES)
@@ -0,0 +1,24 @@
+"""
+Служебная таблица write-behind очереди отчетов: номер последней записи из спула,
+закоммиченной в базу. Обновляется в той же транзакции, что и пачка отчетов,
+поэтому повторный прогон спула после падения не создает дублей.
+"""
+from sqlalchemy.engine import Connection
+from infrastructure.database.migrations.ops import execute_all
+
+VERSION = 5
+DESCRIPTION = "write-behind report queue state"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS write_behind_state (
+        id INTEGER NOT NULL PRIMARY KEY CHECK (id = 1),
+        last_seq INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO write_behind_state (id, last_seq) VALUES (1, 0)",
+]
+
+
+def upgrade(conn: Connection):
+    execute_all(conn, STATEMENTS)
@@ -0,0 +1,61 @@
+"""
+doctors.spec_id становится настоящим внешним ключом на main_specs (для relationship Doctor.specialty).
+SQLite не умеет ADD CONSTRAINT, поэтому таблица пересобирается, строки копируются пачками.
+Ссылки на несуществующие специальности обнуляются.
+"""
+from sqlalchemy.engine import Connection
+from infrastructure.database.migrations.ops import execute_all, has_table, run_in_batches
+
+VERSION = 6
+DESCRIPTION = "doctors.spec_id foreign key to main_specs"
+
+CREATE_NEW_TABLE = """
+    CREATE TABLE doctors_new (
+        id INTEGER NOT NULL,
+        lpu_id INTEGER,
+        doctor VARCHAR,
+        spec_id INTEGER,
+        numb INTEGER,
+        birthdate VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(lpu_id) REFERENCES lpu (lpu_id),
+        FOREIGN KEY(spec_id) REFERENCES main_specs (id)
+    )
+"""
+
+COPY_BATCH = """
+    INSERT INTO doctors_new (id, lpu_id, doctor, spec_id, numb, birthdate)
+    SELECT
+        d.id, d.lpu_id, d.doctor,
+        (SELECT s.id FROM main_specs s WHERE s.id = d.spec_id),
+        d.numb, d.birthdate
+    FROM doctors d
+    WHERE d.id BETWEEN :lo AND :hi
+"""
+
+# v_main_report_export (v0003) ссылается на doctors: RENAME не даст переименовать таблицу,
+# пока view смотрит на удаленную, поэтому на время пересборки view снимается
+VIEW_SQL = "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'v_main_report_export'"
+
+SWAP_TABLES = [
+    "DROP TABLE doctors",
+    "ALTER TABLE doctors_new RENAME TO doctors",
+    "CREATE INDEX IF NOT EXISTS ix_doctors_lpu_id ON doctors (lpu_id)",
+    "CREATE INDEX IF NOT EXISTS ix_doctors_spec_id ON doctors (spec_id)",
+]
+
+
+def upgrade(conn: Connection):
+    if has_table(conn, "doctors_new"):
+        conn.exec_driver_sql("DROP TABLE doctors_new")
+
+    view_sql = conn.exec_driver_sql(VIEW_SQL).scalar()
+    if view_sql:
+        conn.exec_driver_sql("DROP VIEW v_main_report_export")
+
+    execute_all(conn, [CREATE_NEW_TABLE])
+    run_in_batches(conn, "doctors", COPY_BATCH)
+    execute_all(conn, SWAP_TABLES)
+
+    if view_sql:
+        conn.exec_driver_sql(view_sql)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -16,11 +16,16 @@ class Road(Base):
     district_name = Column(String)
     road_num = Column(Integer)
 
+    __table_args__ = (
+        # Поиск маршрута по району и номеру (сейчас маршруты отдает territory_index из памяти)
+        Index("ix_roads_district_road_num", "district_name", "road_num"),
+    )
+
 
 class LPU(Base):
     __tablename__ = "lpu"
     lpu_id = Column(Integer, primary_key=True)
-    road_id = Column(Integer, ForeignKey("roads.road_id"))
+    road_id = Column(Integer, ForeignKey("roads.road_id"), index=True)
     pharmacy_name = Column(String)
     pharmacy_url = Column(String)
 
@@ -30,13 +35,15 @@ class LPU(Base):
 class Doctor(Base):
     __tablename__ = "doctors"
     id = Column(Integer, primary_key=True)
-    lpu_id = Column(Integer, ForeignKey("lpu.lpu_id"))
+    lpu_id = Column(Integer, ForeignKey("lpu.lpu_id"), index=True)
     doctor = Column(String)
-    spec_id = Column(Integer)
+    spec_id = Column(Integer, ForeignKey("main_specs.id"), index=True)
     numb = Column(Integer)
     birthdate = Column(String)
 
     lpu = relationship("LPU")
+    # Грузится вместе с врачом (joinedload в репозитории), отдельный запрос за специальностью не нужен
+    specialty = relationship("MainSpec")
 
 class MainSpec(Base):
     __tablename__ = "main_specs"
@@ -56,6 +63,6 @@ class Apothecary(Base):
 
     # В твоей базе поля: id, road_id, name, url
     id = Column(Integer, primary_key=True)
-    road_id = Column(Integer, ForeignKey("roads.road_id"))
+    road_id = Column(Integer, ForeignKey("roads.road_id"), index=True)
     name = Column(String)
     url = Column(String)
\ No newline at end of file
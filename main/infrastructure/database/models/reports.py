@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, Text, Index, CheckConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base  # Импортируем твой базовый класс
 
@@ -22,6 +22,13 @@ class MainReport(Base):
     commentary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     date: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
 
+    # 🔗 Целочисленные ссылки на справочники (строки выше остаются как история/фолбэк)
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)
+    district_id: Mapped[Optional[int]] = mapped_column(ForeignKey("districts.id"), nullable=True)
+    lpu_id: Mapped[Optional[int]] = mapped_column(ForeignKey("lpu.lpu_id"), nullable=True)
+    doctor_id: Mapped[Optional[int]] = mapped_column(ForeignKey("doctors.id"), nullable=True)
+    spec_id: Mapped[Optional[int]] = mapped_column(ForeignKey("main_specs.id"), nullable=True)
+
     # 🔥 МАГИЯ СВЯЗЕЙ (One-to-Many)
     # Это позволяет нам делать selectinload(MainReport.preps) в репозитории
     preps: Mapped[List["DetailedReport"]] = relationship(
@@ -30,14 +37,24 @@ class MainReport(Base):
         cascade="all, delete-orphan"  # Удалим отчет -> удалятся и препараты
     )
 
+    __table_args__ = (
+        # Выгрузка за период (все сотрудники / один сотрудник)
+        Index("ix_main_reports_date", "date"),
+        Index("ix_main_reports_user_date", "user", "date"),
+        # get_last_doctor_report: последний визит сотрудника к врачу
+        Index("ix_main_reports_user_doc_date", "user", "doc_name", "date"),
+        Index("ix_main_reports_user_id_doctor_date", "user_id", "doctor_id", "date"),
+    )
+
 
 class DetailedReport(Base):
     __tablename__ = "detailed_report"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     # Связываем с главной таблицей через Foreign Key
-    report_id: Mapped[int] = mapped_column(ForeignKey("main_reports.id", ondelete="CASCADE"))
+    report_id: Mapped[int] = mapped_column(ForeignKey("main_reports.id", ondelete="CASCADE"), index=True)
     prep: Mapped[str] = mapped_column(String)
+    medication_id: Mapped[Optional[int]] = mapped_column(ForeignKey("medication.id"), nullable=True, index=True)
 
     # Обратная связь
     report: Mapped["MainReport"] = relationship("MainReport", back_populates="preps")
@@ -66,19 +83,30 @@ class ApothecaryReport(Base):
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_apothecary_report_date", "date"),
+        Index("ix_apothecary_report_user_date", "user", "date"),
+    )
+
 
 class ApothecaryDetailedReport(Base):
     __tablename__ = "apothecary_detailed_report"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    report_id: Mapped[int] = mapped_column(ForeignKey("apothecary_report.id", ondelete="CASCADE"))
+    report_id: Mapped[int] = mapped_column(ForeignKey("apothecary_report.id", ondelete="CASCADE"), index=True)
 
-    prep: Mapped[str] = mapped_column(String)
-    request: Mapped[str] = mapped_column(String)  # В старой базе у тебя это была строка
-    remaining: Mapped[str] = mapped_column(String)  # И это тоже строка
+    prep: Mapped[str] = mapped_column(String, index=True)
+    # Количества — целые числа, чтобы SQL мог суммировать и сравнивать
+    request: Mapped[int] = mapped_column(Integer, default=0)
+    remaining: Mapped[int] = mapped_column(Integer, default=0)
 
     report: Mapped["ApothecaryReport"] = relationship("ApothecaryReport", back_populates="preps")
 
+    __table_args__ = (
+        CheckConstraint("request >= 0", name="ck_apothecary_detailed_report_request"),
+        CheckConstraint("remaining >= 0", name="ck_apothecary_detailed_report_remaining"),
+    )
+
 
 # ============================================================
 # 📋 ЗАДАЧИ И УВЕДОМЛЕНИЯ (Tasks)
@@ -10,7 +10,7 @@ class User(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     # Telegram ID — это всегда большое число (BigInteger), а не строка
     user_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False)
-    user_name: Mapped[str] = mapped_column(String, nullable=True)
+    user_name: Mapped[str] = mapped_column(String, nullable=True, index=True)
     user_password: Mapped[str] = mapped_column(String, nullable=True)
     region: Mapped[str] = mapped_column(String, nullable=True)
 
@@ -1,93 +1,75 @@
-from typing import List, Optional
-from sqlalchemy import select, func
+from typing import Tuple
+from sqlalchemy import select, func, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
-from infrastructure.database.models.pharmacy import District, Road, LPU, Doctor, Medication, Apothecary, MainSpec
+from infrastructure.database.models.pharmacy import LPU, Doctor, Apothecary, MainSpec
+from infrastructure.database.unit_of_work import on_commit
+from infrastructure.database.dto import LpuRow, ApothecaryRow, DoctorRow, SpecRow
+from infrastructure.cache.territory_index import territory_index
+from infrastructure.cache.single_flight import SingleFlight, single_flight
+
+
+# Одна группа на процесс: одинаковые одновременные чтения из разных апдейтов склеиваются.
+# Навигация по территориям и справочники читаются из territory_index и medication_catalog;
+# через репозиторий идут только списки после добавления ЛПУ, аптеки или врача и список специальностей
+pharmacy_reads = SingleFlight("pharmacy_repo")
+
+# ==================================================
+# 📌 ГОТОВЫЕ ВЫРАЖЕНИЯ ДЛЯ ГОРЯЧИХ ЧТЕНИЙ
+# Строятся один раз при импорте: ни сборки select(), ни пересчета cache key на каждый вызов,
+# скомпилированный SQL берется из кеша движка. Значения передаются через bindparam.
+# Списочные чтения выбирают только нужные колонки и отдают кортежи строк из dto (без ORM-объектов):
+# их безопасно отдавать всем склеенным вызовам.
+# ==================================================
+
+_LPUS_BY_ROAD = select(LPU.lpu_id, LPU.road_id, LPU.pharmacy_name, LPU.pharmacy_url).where(LPU.road_id == bindparam("road_id")).order_by(LPU.pharmacy_name)
+_APOTHECARIES_BY_ROAD = (
+    select(Apothecary.id, Apothecary.road_id, Apothecary.name, Apothecary.url)
+    .where(Apothecary.road_id == bindparam("road_id"))
+    .order_by(Apothecary.name)
+)
+_DOCTORS_BY_LPU = (
+    select(Doctor.id, Doctor.lpu_id, Doctor.doctor, Doctor.spec_id, Doctor.numb, MainSpec.spec)
+    .outerjoin(Doctor.specialty)
+    .where(Doctor.lpu_id == bindparam("lpu_id"))
+    .order_by(Doctor.doctor)
+)
+_ALL_SPECS = select(MainSpec.id, MainSpec.spec).order_by(MainSpec.spec)
 
 
 class PharmacyRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
+        # После первой записи в сессии чтения идут напрямую (им нужны свои незакоммиченные строки)
+        self.coalesce_reads = True
 
     # ==================================================
     # 🔍 МЕТОДЫ ЧТЕНИЯ (READ)
     # ==================================================
 
-    async def get_districts_by_region(self, region_code: str) -> List[District]:
-        """Получает список районов для конкретного региона"""
-        stmt = select(District).where(District.region == region_code).order_by(District.name)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
-
-    async def get_district_by_id(self, district_id: int) -> Optional[District]:
-        """Находит район по ID (нужно для получения имени в отчет)"""
-        stmt = select(District).where(District.id == district_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
-
-    async def get_road_id_by_data(self, district_id: int, road_num: int) -> Optional[int]:
-        """Ищет road_id по ID района и номеру маршрута."""
-        stmt = select(Road.road_id).where(
-            Road.district_name == district_id,
-            Road.road_num == road_num
-        )
-        result = await self.session.execute(stmt)
-        return result.scalar()
-
     # --- ЛПУ и Аптеки ---
 
-    async def get_lpus_by_road(self, road_id: int) -> List[LPU]:
-        stmt = select(LPU).where(LPU.road_id == road_id).order_by(LPU.pharmacy_name)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
-
-    async def get_lpu_by_id(self, lpu_id: int) -> Optional[LPU]:
-        """Получает конкретное ЛПУ по ID"""
-        stmt = select(LPU).where(LPU.lpu_id == lpu_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
-
-    async def get_apothecaries_by_road(self, road_id: int) -> List[Apothecary]:
-        stmt = select(Apothecary).where(Apothecary.road_id == road_id).order_by(Apothecary.name)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
-
-    async def get_apothecary_by_id(self, apt_id: int) -> Optional[Apothecary]:
-        """Получает конкретную аптеку по ID"""
-        stmt = select(Apothecary).where(Apothecary.id == apt_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
-
-    # --- Врачи, Специальности и Препараты ---
-
-    async def get_doctors_by_lpu(self, lpu_id: int) -> List[Doctor]:
-        stmt = select(Doctor).where(Doctor.lpu_id == lpu_id).order_by(Doctor.doctor)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
-
-    async def get_doctor_by_id(self, doc_id: int) -> Optional[Doctor]:
-        stmt = select(Doctor).where(Doctor.id == doc_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+    @single_flight(pharmacy_reads)
+    async def get_lpus_by_road(self, road_id: int) -> Tuple[LpuRow, ...]:
+        result = await self.session.execute(_LPUS_BY_ROAD, {"road_id": road_id})
+        return tuple(LpuRow(*row) for row in result)
 
-    async def get_all_specs(self) -> List[MainSpec]:
-        stmt = select(MainSpec).order_by(MainSpec.spec)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+    @single_flight(pharmacy_reads)
+    async def get_apothecaries_by_road(self, road_id: int) -> Tuple[ApothecaryRow, ...]:
+        result = await self.session.execute(_APOTHECARIES_BY_ROAD, {"road_id": road_id})
+        return tuple(ApothecaryRow(*row) for row in result)
 
-    async def get_spec_name(self, spec_id: int) -> str:
-        """Получает название специальности по ID без сырого SQL"""
-        if not spec_id:
-            return "Не указана"
+    # --- Врачи и Специальности ---
 
-        stmt = select(MainSpec.spec).where(MainSpec.id == spec_id)
-        result = await self.session.execute(stmt)
-        spec_name = result.scalar_one_or_none()
-        return spec_name if spec_name else "Не указана"
+    @single_flight(pharmacy_reads)
+    async def get_doctors_by_lpu(self, lpu_id: int) -> Tuple[DoctorRow, ...]:
+        """Врачи ЛПУ вместе с названием специальности (один запрос с outer join)"""
+        result = await self.session.execute(_DOCTORS_BY_LPU, {"lpu_id": lpu_id})
+        return tuple(DoctorRow(*row) for row in result)
 
-    async def get_preps(self) -> List[Medication]:
-        stmt = select(Medication).order_by(Medication.prep)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+    @single_flight(pharmacy_reads)
+    async def get_all_specs(self) -> Tuple[SpecRow, ...]:
+        result = await self.session.execute(_ALL_SPECS)
+        return tuple(SpecRow(*row) for row in result)
 
     # ==================================================
     # ✍️ МЕТОДЫ ДОБАВЛЕНИЯ (WRITE)
@@ -95,14 +77,20 @@ class PharmacyRepository:
 
     async def add_lpu(self, road_id: int, name: str, url: str = None) -> LPU:
         new_lpu = LPU(road_id=road_id, pharmacy_name=name, pharmacy_url=url)
+        self.coalesce_reads = False
         self.session.add(new_lpu)
-        await self.session.commit()
+        await self.session.flush()
+        node = LpuRow(new_lpu.lpu_id, road_id, name, url)
+        on_commit(self.session, lambda: territory_index.add_lpu(node))
         return new_lpu
 
     async def add_apothecary(self, road_id: int, name: str, url: str = None) -> Apothecary:
         new_apt = Apothecary(road_id=road_id, name=name, url=url)
+        self.coalesce_reads = False
         self.session.add(new_apt)
-        await self.session.commit()
+        await self.session.flush()
+        node = ApothecaryRow(new_apt.id, road_id, name, url)
+        on_commit(self.session, lambda: territory_index.add_apothecary(node))
         return new_apt
 
     async def get_or_create_spec_id(self, spec_name: str) -> int:
@@ -116,15 +104,20 @@ class PharmacyRepository:
             return existing.id
 
         new_spec = MainSpec(spec=clean_name)
+        self.coalesce_reads = False
         self.session.add(new_spec)
-        await self.session.commit()
-        # Refresh нужен, чтобы получить сгенерированный базой ID
-        await self.session.refresh(new_spec)
-        return new_spec.id
+        # flush отдает сгенерированный базой ID без commit (коммитит мидлварь)
+        await self.session.flush()
+        spec_id = new_spec.id
+        on_commit(self.session, lambda: territory_index.add_spec(spec_id, clean_name))
+        return spec_id
 
     async def add_doctor(self, lpu_id: int, name: str, spec_id: int, numb: str = None) -> Doctor:
         """Используем только один правильный метод с spec_id"""
         new_doc = Doctor(lpu_id=lpu_id, doctor=name, spec_id=spec_id, numb=numb)
+        self.coalesce_reads = False
         self.session.add(new_doc)
-        await self.session.commit()
+        await self.session.flush()
+        node = DoctorRow(new_doc.id, lpu_id, name, spec_id, new_doc.numb)
+        on_commit(self.session, lambda: territory_index.add_doctor(node))
         return new_doc
\ No newline at end of file
@@ -1,6 +1,6 @@
-from typing import List, Optional, Tuple
-from datetime import datetime
-from sqlalchemy import select, func, and_, desc
+from typing import AsyncIterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import Row, select, insert, func, desc, bindparam
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from utils.logger.logger_config import logger
@@ -11,82 +11,147 @@ from infrastructure.database.models.reports import (
     ApothecaryReport, ApothecaryDetailedReport,
     Task, UserTaskProgress
 )
+from infrastructure.database.unit_of_work import on_commit
+from infrastructure.cache.task_state import task_state
+
+
+# Последний визит к врачу (selectinload подтягивает препараты). Готовые выражения:
+# по ID (основной путь) и по именам (фолбэк для старых отчетов без ID)
+_LAST_DOCTOR_REPORT = select(MainReport).options(selectinload(MainReport.preps)).order_by(desc(MainReport.date)).limit(1)
+_LAST_DOCTOR_REPORT_BY_IDS = _LAST_DOCTOR_REPORT.where(
+    MainReport.user_id == bindparam("user_id"),
+    MainReport.doctor_id == bindparam("doctor_id")
+)
+_LAST_DOCTOR_REPORT_BY_NAMES = _LAST_DOCTOR_REPORT.where(
+    MainReport.user == bindparam("user_name"),
+    MainReport.doc_name == bindparam("doctor_name")
+)
+
+# Выгрузка в Excel: колонки в порядке листа, имена — те, что читает excel_generator
+EXPORT_CHUNK_SIZE = 1000
+
+_DOCTOR_PREPS = (
+    select(func.coalesce(func.group_concat(DetailedReport.prep, ", "), ""))
+    .where(DetailedReport.report_id == MainReport.id)
+    .scalar_subquery()
+)
+_DOCTOR_EXPORT = select(
+    MainReport.id, MainReport.date, MainReport.user, MainReport.district, MainReport.road, MainReport.lpu,
+    MainReport.doc_name.label("doctor_name"),
+    MainReport.doc_spec.label("doctor_spec"),
+    MainReport.doc_num.label("doctor_number"),
+    MainReport.term,
+    _DOCTOR_PREPS.label("preps"),
+    MainReport.commentary,
+).order_by(desc(MainReport.date))
+
+_APOTHECARY_EXPORT = (
+    select(
+        ApothecaryReport.id, ApothecaryReport.date, ApothecaryReport.user, ApothecaryReport.district,
+        ApothecaryReport.road, ApothecaryReport.apothecary.label("lpu"),
+        ApothecaryDetailedReport.prep.label("prep_name"),
+        ApothecaryDetailedReport.request.label("req_qty"),
+        ApothecaryDetailedReport.remaining.label("rem_qty"),
+        ApothecaryReport.commentary,
+    )
+    .join(ApothecaryDetailedReport, ApothecaryDetailedReport.report_id == ApothecaryReport.id)
+    .order_by(desc(ApothecaryReport.date), ApothecaryDetailedReport.id)
+)
+
+
+def _date_range(start_date: str, end_date: str) -> Tuple[datetime, datetime]:
+    """
+    Превращает включительный период дат в полуоткрытый [start 00:00, end+1 00:00).
+    Так фильтр остается sargable: никаких func.date() над колонкой.
+    """
+    date_from = datetime.strptime(start_date, "%Y-%m-%d")
+    date_to = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    return date_from, date_to
 
 
 class ReportRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
+        # last_task_id, отмеченные в этой сессии, но еще не закоммиченные (task_state их пока не видит)
+        self._pending_last_seen = {}
 
     # ============================================================
     # 📝 СОХРАНЕНИЕ ОТЧЕТОВ (WRITE)
     # ============================================================
 
-    async def save_main_report(
+    async def add_doctor_report(
             self, user: str, district: str, road: int, lpu: str,
             doctor_name: str, doctor_spec: str, doctor_number: str,
-            term: str, comment: str
-    ) -> MainReport:
-        """Сохраняет основной отчет и возвращает объект отчета"""
-        new_report = MainReport(
+            term: str, comment: str,
+            preps: List[Tuple[Optional[int], str]],
+            user_id: Optional[int] = None, district_id: Optional[int] = None,
+            lpu_id: Optional[int] = None, doctor_id: Optional[int] = None,
+            spec_id: Optional[int] = None, date: Optional[datetime] = None
+    ) -> int:
+        """
+        Пишет визит к врачу БЕЗ commit (коммитит мидлварь): шапка (INSERT ... RETURNING id)
+        + все препараты одним multi-VALUES INSERT.
+        preps = [(medication_id, name), ...]. Возвращает ID отчета.
+        """
+        report_id = await self._insert_returning_id(insert(MainReport).values(
             user=user, district=district, road=road, lpu=lpu,
             doc_name=doctor_name, doc_spec=doctor_spec, doc_num=doctor_number,
-            term=term, commentary=comment, date=datetime.now()
-        )
-        self.session.add(new_report)
-        await self.session.commit()
-        await self.session.refresh(new_report)  # Чтобы получить ID
-        return new_report
-
-    async def save_preps(self, report_id: int, preps_list: List[str]):
-        """Массовое сохранение препаратов к отчету"""
-        detailed_records = [
-            DetailedReport(report_id=report_id, prep=prep_name)
-            for prep_name in preps_list
-        ]
-        self.session.add_all(detailed_records)
-        await self.session.commit()
-
-    async def save_apothecary_report(
-            self, user: str, district: str, road: int, lpu: str, comment: str
-    ) -> ApothecaryReport:
-        new_report = ApothecaryReport(
+            term=term, commentary=comment, date=date or datetime.now(),
+            user_id=user_id, district_id=district_id, lpu_id=lpu_id,
+            doctor_id=doctor_id, spec_id=spec_id
+        ))
+
+        if preps:
+            await self.session.execute(insert(DetailedReport).values([
+                {"report_id": report_id, "medication_id": med_id, "prep": prep_name}
+                for med_id, prep_name in preps
+            ]))
+        return report_id
+
+    async def add_apothecary_report(
+            self, user: str, district: str, road: int, lpu: str, comment: str,
+            items: List[Tuple[str, int, int]], date: Optional[datetime] = None
+    ) -> int:
+        """То же для аптеки (без commit). items = [(name, req, rem), ...]"""
+        report_id = await self._insert_returning_id(insert(ApothecaryReport).values(
             user=user, district=district, road=road, apothecary=lpu,
-            commentary=comment, date=datetime.now()
-        )
-        self.session.add(new_report)
-        await self.session.commit()
-        await self.session.refresh(new_report)
-        return new_report
-
-    async def save_apothecary_preps(self, report_id: int, items: List[Tuple[str, int, int]]):
-        """items = [(name, req, rem), ...]"""
-        detailed_records = [
-            ApothecaryDetailedReport(
-                report_id=report_id, prep=item[0], request=str(item[1]), remaining=str(item[2])
-            ) for item in items
-        ]
-        self.session.add_all(detailed_records)
-        await self.session.commit()
+            commentary=comment, date=date or datetime.now()
+        ))
+
+        if items:
+            await self.session.execute(insert(ApothecaryDetailedReport).values([
+                {"report_id": report_id, "prep": name, "request": int(req), "remaining": int(rem)}
+                for name, req, rem in items
+            ]))
+        return report_id
+
+    async def _insert_returning_id(self, stmt) -> int:
+        table = stmt.table
+        result = await self.session.execute(stmt.returning(table.c.id))
+        return result.scalar_one()
 
     # ============================================================
     # 🕵️‍♂️ ПОЛУЧЕНИЕ ДАННЫХ (READ)
     # ============================================================
 
-    async def get_last_doctor_report(self, user_name: str, doctor_name: str) -> Optional[dict]:
+    async def get_last_doctor_report(
+            self, user_name: str, doctor_name: str,
+            user_id: Optional[int] = None, doctor_id: Optional[int] = None
+    ) -> Optional[dict]:
         """Получает последний отчет по врачу вместе со списком препаратов"""
-        # Используем selectinload для автоматической подгрузки препаратов (One-to-Many)
-        stmt = (
-            select(MainReport)
-            .options(selectinload(MainReport.preps))  # Требует relationship в модели!
-            .where(
-                MainReport.user == user_name,
-                MainReport.doc_name == doctor_name
+        report = None
+
+        # Если известны ID — ищем по целым числам (не ломается при переименовании)
+        if user_id is not None and doctor_id is not None:
+            report = await self._last_doctor_report(
+                _LAST_DOCTOR_REPORT_BY_IDS, {"user_id": user_id, "doctor_id": doctor_id}
+            )
+
+        # Фолбэк для старых отчетов, которые миграция не смогла сопоставить со справочником
+        if not report:
+            report = await self._last_doctor_report(
+                _LAST_DOCTOR_REPORT_BY_NAMES, {"user_name": user_name, "doctor_name": doctor_name}
             )
-            .order_by(desc(MainReport.date))
-            .limit(1)
-        )
-        result = await self.session.execute(stmt)
-        report = result.scalar_one_or_none()
 
         if not report:
             return None
@@ -99,141 +164,71 @@ class ReportRepository:
             "preps": [p.prep for p in report.preps] if hasattr(report, 'preps') else []
         }
 
-    # ============================================================
-    # 📊 FETCH DATA (Для Excel и Фильтрации)
-    # ============================================================
-
-    async def fetch_filtered_doctor_data(
-            self, start_date: str, end_date: str, user_name: Optional[str] = None
-    ) -> List[dict]:
-        """Выгрузка данных для Excel с жадной загрузкой препаратов"""
-
-        # Конвертируем строки в объекты date для надежного сравнения
-        s_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-        e_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-
-        stmt = select(MainReport).options(selectinload(MainReport.preps))
-
-        # Фильтруем по дате (приводим datetime из базы к date)
-        conditions = [func.date(MainReport.date).between(s_date, e_date)]
-
-        if user_name and user_name != "all":
-            conditions.append(MainReport.user == user_name)
-
-        stmt = stmt.where(and_(*conditions)).order_by(desc(MainReport.date))
-
-        result = await self.session.execute(stmt)
-        reports = result.scalars().all()
-
-        # Форматируем данные в Python, а не через хаки SQL
-        return [{
-            "id": r.id,
-            "created_at": r.date,
-            "user_name": r.user,
-            "district": r.district,
-            "road": r.road,
-            "lpu": r.lpu,
-            "doctor_name": r.doc_name,
-            "doctor_spec": r.doc_spec,
-            "doctor_number": r.doc_num,
-            "term": r.term,
-            "commentary": r.commentary,
-            "preps": ", ".join([p.prep for p in r.preps]) if r.preps else ""
-        } for r in reports]
-
-    async def fetch_filtered_apothecary_data(
-            self, start_date: str, end_date: str, user_name: Optional[str] = None
-    ) -> List[dict]:
-        s_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-        e_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-
-        stmt = select(ApothecaryReport).options(selectinload(ApothecaryReport.preps))
-
-        conditions = [func.date(ApothecaryReport.date).between(s_date, e_date)]
-        if user_name and user_name != "all":
-            conditions.append(ApothecaryReport.user == user_name)
-
-        stmt = stmt.where(and_(*conditions)).order_by(desc(ApothecaryReport.date))
-
-        result = await self.session.execute(stmt)
-        reports = result.scalars().all()
-
-        output = []
-        for r in reports:
-            # Для аптек у нас препараты хранятся с количеством (req_qty, rem_qty)
-            # Разворачиваем их в плоский список словарей, как ожидает генератор Excel
-            for p in r.preps:
-                output.append({
-                    "id": r.id,
-                    "created_at": r.date,
-                    "user_name": r.user,
-                    "district": r.district,
-                    "road": r.road,
-                    "lpu": r.apothecary,
-                    "prep_name": p.prep,
-                    "req_qty": p.request,
-                    "rem_qty": p.remaining,
-                    "commentary": r.commentary
-                })
-        return output
+    async def _last_doctor_report(self, stmt, params: dict) -> Optional[MainReport]:
+        result = await self.session.execute(stmt, params)
+        return result.scalar_one_or_none()
 
     # ============================================================
-    # ♾️ FULL DUMP (Выгрузка всей базы)
+    # 📊 ВЫГРУЗКА ДЛЯ EXCEL (потоком, порциями)
     # ============================================================
 
-    async def get_all_doctor_reports(self) -> List[dict]:
-        """Выгружает абсолютно все отчеты по врачам (за всё время)"""
-        stmt = (
-            select(MainReport)
-            .options(selectinload(MainReport.preps))
-            .order_by(desc(MainReport.date))
-        )
-
-        result = await self.session.execute(stmt)
-        reports = result.scalars().all()
-
-        return [{
-            "id": r.id,
-            "created_at": r.date,
-            "user_name": r.user,
-            "district": r.district,
-            "road": r.road,
-            "lpu": r.lpu,
-            "doctor_name": r.doc_name,
-            "doctor_spec": r.doc_spec,
-            "doctor_number": r.doc_num,
-            "term": r.term,
-            "commentary": r.commentary,
-            "preps": ", ".join([p.prep for p in r.preps]) if r.preps else ""
-        } for r in reports]
-
-    async def get_all_apothecary_reports(self) -> List[dict]:
-        """Выгружает абсолютно все отчеты по аптекам (за всё время)"""
-        stmt = (
-            select(ApothecaryReport)
-            .options(selectinload(ApothecaryReport.preps))
-            .order_by(desc(ApothecaryReport.date))
-        )
-
-        result = await self.session.execute(stmt)
-        reports = result.scalars().all()
-
-        output = []
-        for r in reports:
-            for p in r.preps:
-                output.append({
-                    "id": r.id,
-                    "created_at": r.date,
-                    "user_name": r.user,
-                    "district": r.district,
-                    "road": r.road,
-                    "lpu": r.apothecary,
-                    "prep_name": p.prep,
-                    "req_qty": p.request,
-                    "rem_qty": p.remaining,
-                    "commentary": r.commentary
-                })
-        return output
+    async def stream_doctor_export(
+            self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+            user_name: Optional[str] = None, chunk_size: int = EXPORT_CHUNK_SIZE
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Отчеты по врачам для Excel порциями по chunk_size строк (без периода — за всё время).
+        Один запрос: препараты склеивает SQL (group_concat), строки читаются курсором через stream().
+        """
+        conditions = self._period_conditions(MainReport, start_date, end_date, user_name)
+        async for chunk in self._stream(_DOCTOR_EXPORT.where(*conditions), chunk_size):
+            yield chunk
+
+    async def stream_apothecary_export(
+            self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+            user_name: Optional[str] = None, chunk_size: int = EXPORT_CHUNK_SIZE
+    ) -> AsyncIterator[List[Row]]:
+        """Отчеты по аптекам: одна строка на препарат (заявка и остаток), порциями по chunk_size"""
+        conditions = self._period_conditions(ApothecaryReport, start_date, end_date, user_name)
+        async for chunk in self._stream(_APOTHECARY_EXPORT.where(*conditions), chunk_size):
+            yield chunk
+
+    async def get_export_watermark(
+            self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+            user_name: Optional[str] = None
+    ) -> Tuple:
+        """
+        «Версия» данных выгрузки: число строк, max id и max date по обеим таблицам с тем же фильтром.
+        Отчеты только добавляются, так что при совпадении версии выгрузка та же (export_cache).
+        Оба запроса покрываются индексами по date / (user, date).
+        """
+        watermark = ()
+        for model in (MainReport, ApothecaryReport):
+            conditions = self._period_conditions(model, start_date, end_date, user_name)
+            stmt = select(func.count(), func.max(model.id), func.max(model.date)).where(*conditions)
+            watermark += tuple((await self.session.execute(stmt)).one())
+        return watermark
+
+    async def _stream(self, stmt, chunk_size: int) -> AsyncIterator[List[Row]]:
+        result = await self.session.stream(stmt.execution_options(yield_per=chunk_size))
+        try:
+            async for chunk in result.partitions(chunk_size):
+                yield chunk
+        finally:
+            await result.close()
+
+    @staticmethod
+    def _period_conditions(
+            model, start_date: Optional[str], end_date: Optional[str], user_name: Optional[str]
+    ) -> list:
+        conditions = []
+        # Полуоткрытый диапазон по «сырой» колонке — его обслуживает индекс по date
+        if start_date and end_date:
+            date_from, date_to = _date_range(start_date, end_date)
+            conditions += [model.date >= date_from, model.date < date_to]
+        if user_name and user_name != "all":
+            conditions.append(model.user == user_name)
+        return conditions
 
     # ============================================================
     # 📋 TASKS (Задачи)
@@ -242,7 +237,9 @@ class ReportRepository:
     async def add_task(self, text: str):
         new_task = Task(text=text, is_active=True)
         self.session.add(new_task)
-        await self.session.commit()
+        await self.session.flush()
+        task_id = new_task.id
+        on_commit(self.session, lambda: task_state.add_task(task_id))
 
     async def get_active_tasks(self) -> List[dict]:
         stmt = select(Task).where(Task.is_active == True).order_by(desc(Task.id)).limit(5)
@@ -252,6 +249,10 @@ class ReportRepository:
 
     async def get_unread_count(self, user_id: int) -> int:
         """Считает количество новых (непрочитанных) задач для пользователя"""
+        if task_state.loaded:
+            # Из памяти, без запросов к БД
+            return task_state.unread_count(user_id, self._pending_last_seen.get(user_id))
+
         try:
             # 1. Узнаем ID последней прочитанной задачи
             stmt_progress = select(UserTaskProgress.last_task_id).where(UserTaskProgress.user_id == user_id)
@@ -270,19 +271,25 @@ class ReportRepository:
             return 0
 
     async def mark_all_as_read(self, user_id: int):
-        """Отмечает все текущие задачи как прочитанные (Upsert)"""
-        try:
-            # 1. Находим максимальный ID среди активных задач
+        """
+        Отмечает все текущие задачи как прочитанные (Upsert).
+        Ошибку базы пробрасывает: что делать с транзакцией апдейта, решает хэндлер.
+        """
+        # 1. Находим максимальный ID среди активных задач
+        if task_state.loaded:
+            max_id = task_state.max_active_id()
+        else:
             stmt_max = select(func.max(Task.id)).where(Task.is_active == True)
             result_max = await self.session.execute(stmt_max)
             max_id = result_max.scalar_one_or_none() or 0
 
-            if max_id == 0:
-                return
+        if max_id == 0:
+            return
 
-            # 2. Обновляем или создаем запись прогресса (аналог INSERT OR REPLACE)
-            progress = UserTaskProgress(user_id=user_id, last_task_id=max_id)
-            await self.session.merge(progress)
-            await self.session.commit()
-        except Exception as e:
-            logger.error(f"Error marking tasks as read: {e}")
\ No newline at end of file
+        # 2. Обновляем или создаем запись прогресса (аналог INSERT OR REPLACE)
+        progress = UserTaskProgress(user_id=user_id, last_task_id=max_id)
+        await self.session.merge(progress)
+        await self.session.flush()
+
+        self._pending_last_seen[user_id] = max_id
+        on_commit(self.session, lambda: task_state.mark_read(user_id, max_id))
\ No newline at end of file
@@ -1,26 +1,51 @@
 from typing import Optional, List
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from infrastructure.database.models.users import User
+from infrastructure.database.unit_of_work import on_commit
+from infrastructure.cache.user_cache import user_cache, UserProfile
+
+
+# Готовые выражения для горячих чтений (строятся один раз, SQL берется из кеша компиляции)
+_USER_BY_TG_ID = select(User).where(User.user_id == bindparam("user_id"))
+_USER_BY_NAME = select(User).where(User.user_name == bindparam("username"))
+_PROFILE_BY_TG_ID = select(
+    User.id, User.user_id, User.user_name, User.region, User.is_approved, User.logged_in
+).where(User.user_id == bindparam("user_id"))
+_IS_APPROVED = select(User.is_approved).where(User.user_id == bindparam("user_id"))
 
 
 class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
+        # Пользователи, измененные в этой (еще не закоммиченной) сессии — их профили не кешируем
+        self._changed_users = set()
 
     # ============================================================
     # 👤 БАЗОВЫЕ ОПЕРАЦИИ С ПОЛЬЗОВАТЕЛЕМ
     # ============================================================
 
     async def get_user(self, user_id: int) -> Optional[User]:
-        stmt = select(User).where(User.user_id == user_id)
-        result = await self.session.execute(stmt)
+        result = await self.session.execute(_USER_BY_TG_ID, {"user_id": user_id})
         return result.scalar_one_or_none()
 
+    async def get_profile(self, user_id: int) -> Optional[UserProfile]:
+        """Профиль для проверок доступа и меню: из кеша, в базу — только при промахе"""
+        if user_id not in self._changed_users:
+            cached, profile = user_cache.get(user_id)
+            if cached:
+                return profile
+
+        generation = user_cache.generation(user_id)
+        row = (await self.session.execute(_PROFILE_BY_TG_ID, {"user_id": user_id})).first()
+        profile = UserProfile(*row) if row else None
+        if user_id not in self._changed_users:
+            user_cache.put(user_id, profile, generation)
+        return profile
+
     async def get_user_by_username(self, username: str) -> Optional[User]:
         """Поиск по имени (для логина)"""
-        stmt = select(User).where(User.user_name == username)
-        result = await self.session.execute(stmt)
+        result = await self.session.execute(_USER_BY_NAME, {"username": username})
         return result.scalar_one_or_none()
 
     async def get_approved_usernames(self) -> List[str]:
@@ -44,7 +69,8 @@ class UserRepository:
             logged_in=True    # Используем Boolean вместо 1
         )
         self.session.add(new_user)
-        await self.session.commit()
+        await self.session.flush()
+        self._invalidate(user_id)
         return new_user
 
     async def set_logged_in(self, telegram_id: int, status: bool):
@@ -55,7 +81,7 @@ class UserRepository:
             .values(logged_in=status)
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        self._invalidate(telegram_id)
 
     # ============================================================
     # 👮 МОДЕРАЦИЯ И АДМИН-ПАНЕЛЬ (Восстановлено из легаси)
@@ -71,16 +97,22 @@ class UserRepository:
         """Одобряет заявку пользователя"""
         stmt = update(User).where(User.user_id == user_id).values(is_approved=True)
         await self.session.execute(stmt)
-        await self.session.commit()
+        self._invalidate(user_id)
 
     async def delete_user(self, user_id: int):
         """Удаляет отклоненного или старого пользователя"""
         stmt = delete(User).where(User.user_id == user_id)
         await self.session.execute(stmt)
-        await self.session.commit()
+        self._invalidate(user_id)
 
     async def is_user_approved(self, user_id: int) -> Optional[bool]:
         """Точечная проверка статуса (для мидлварей блокировки)"""
-        stmt = select(User.is_approved).where(User.user_id == user_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
\ No newline at end of file
+        result = await self.session.execute(_IS_APPROVED, {"user_id": user_id})
+        return result.scalar_one_or_none()
+
+    def _invalidate(self, user_id: int):
+        # Этот апдейт читает профиль мимо кеша, а кеш сбрасывается после commit:
+        # параллельный апдейт мог закешировать старую версию, пока запись не зафиксирована
+        self._changed_users.add(user_id)
+        user_cache.invalidate(user_id)
+        on_commit(self.session, lambda: user_cache.invalidate(user_id))
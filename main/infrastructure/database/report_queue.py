@@ -0,0 +1,370 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.repo.report_repo import ReportRepository
+from utils.logger.logger_config import logger
+
+
+SpoolRecord = Tuple[int, str, Dict[str, Any]]  # (seq, kind, payload)
+
+
+class ReportWriteQueue:
+    """
+    Write-behind очередь отчетов с групповым коммитом.
+
+    1. enqueue() дописывает отчет в локальный append-only спул (flush + fsync) и сразу возвращает управление.
+    2. Единственный writer-таск забирает отчеты пачками (не больше max_batch, не дольше max_delay)
+       и пишет их в SQLite ОДНОЙ транзакцией вместе с номером последней записи спула.
+    3. При старте незакоммиченный хвост спула прогоняется заново — отчет не теряется при падении.
+
+    База занята/заблокирована (OperationalError) — пачка повторяется целиком с нарастающей паузой.
+    В .rejected уходит только запись, которую база отвергла по содержимому (целостность, данные).
+    Writer не умирает от ошибок: состояние видно в health, отказ writer-а пишется в лог как critical.
+    """
+
+    KINDS = ("doctor", "apothecary")
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker,
+            spool_path: str,
+            max_batch: int = 100,
+            max_delay: float = 0.05,
+            max_queue: int = 10_000,
+            fsync: bool = True,
+            retry_delay: float = 0.1,
+            max_retry_delay: float = 5.0
+    ):
+        self.session_factory = session_factory
+        self.spool_path = spool_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._capacity = asyncio.Semaphore(max_queue)
+        self._spool_lock = asyncio.Lock()
+        self._spool = None
+        self._writer: Optional[asyncio.Task] = None
+        self._seq = 0
+        self._committed_seq = 0
+        self._written = 0   # Строк записано в буфер спула
+        self._synced = 0    # Строк гарантированно на диске
+        self._sync_task: Optional[asyncio.Task] = None
+        self._failing_since: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+        self.stats = {"enqueued": 0, "committed": 0, "batches": 0, "rejected": 0, "retries": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    @property
+    def health(self) -> Dict[str, Any]:
+        """Для мониторинга: жив ли writer, сколько ждет записи и как давно база не принимает пачку"""
+        failing_for = time.monotonic() - self._failing_since if self._failing_since is not None else None
+        return {
+            "running": self.running,
+            "healthy": self.running and failing_for is None,
+            "backlog": self._seq - self._committed_seq,
+            "failing_for": failing_for,
+            "last_error": self._last_error,
+            **self.stats,
+        }
+
+    # ==================================================
+    # 🚀 ЖИЗНЕННЫЙ ЦИКЛ
+    # ==================================================
+
+    async def start(self):
+        spool_dir = os.path.dirname(os.path.abspath(self.spool_path))
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self._committed_seq = await self._load_committed_seq()
+        pending = self._read_spool()
+        self._seq = max([self._committed_seq] + [seq for seq, _, _ in pending])
+
+        # Спул перезаписываем только незакоммиченным хвостом
+        self._rewrite_spool(pending)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+        self._writer = asyncio.create_task(self._writer_loop(), name="report-writer")
+        self._writer.add_done_callback(self._on_writer_done)
+
+        if pending:
+            logger.warning(f"♻️ Replaying {len(pending)} uncommitted reports from spool")
+        for record in pending:
+            await self._capacity.acquire()
+            self._queue.put_nowait(record)
+        logger.info(f"🧾 Report write-behind queue started (batch={self.max_batch}, delay={self.max_delay}s)")
+
+    async def stop(self, timeout: float = 30):
+        """
+        Дожидается записи всего, что уже в очереди (не дольше timeout), и останавливает writer.
+        Если база так и не приняла хвост — он остается в спуле и будет записан при следующем старте.
+        """
+        if self._writer is None:
+            return
+
+        if self.running:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"❌ Report writer did not drain in {timeout}s, {self.health['backlog']} reports stay in spool")
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+
+        self._writer = None
+        self._spool.close()
+        self._spool = None
+        if self._seq == self._committed_seq:
+            self._rewrite_spool([])
+        logger.info(f"🧾 Report write-behind queue stopped: {self.stats}")
+
+    def _on_writer_done(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        # Сюда попадаем только при ошибке в самом цикле: отчеты принимать больше некому
+        logger.critical(f"❌ Report writer died: {task.exception()!r}; new reports are refused until restart")
+
+    # ==================================================
+    # 📥 ПРИЕМ ОТЧЕТОВ
+    # ==================================================
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> int:
+        """Надежно (fsync) принимает отчет. После возврата отчет переживет падение процесса."""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown report kind: {kind}")
+        if not self.running:
+            raise RuntimeError(f"Report write-behind queue is not running (last error: {self._last_error})")
+
+        payload = dict(payload)
+        payload.setdefault("date", datetime.now())
+
+        # Backpressure: не больше max_queue отчетов в памяти
+        await self._capacity.acquire()
+
+        # Без await между номером, спулом и очередью — writer видит отчеты строго по порядку seq
+        self._seq += 1
+        record = (self._seq, kind, payload)
+        line = json.dumps({"seq": self._seq, "kind": kind, "payload": payload}, default=_json_default)
+        self._spool.write(line + "\n")
+        self._written += 1
+        self._queue.put_nowait(record)
+        self.stats["enqueued"] += 1
+
+        # Подтверждаем агенту только после того, как строка легла на диск
+        await self._wait_durable(self._written)
+        return record[0]
+
+    async def _wait_durable(self, line_no: int):
+        """
+        Групповой fsync: пока идет один fsync, новые строки копятся в буфере,
+        и следующий fsync подтверждает их все разом.
+        """
+        while self._synced < line_no:
+            if self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._sync_spool())
+            await asyncio.shield(self._sync_task)
+
+    async def _sync_spool(self):
+        try:
+            async with self._spool_lock:
+                upto = self._written
+                self._spool.flush()
+                if self.fsync:
+                    await asyncio.to_thread(os.fsync, self._spool.fileno())
+                self._synced = upto
+        finally:
+            self._sync_task = None
+
+    # ==================================================
+    # ✍️ WRITER (групповой коммит)
+    # ==================================================
+
+    async def _writer_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                    self._capacity.release()
+
+            try:
+                await self._maybe_compact_spool()
+            except Exception as e:
+                # Не сжали спул — не страшно, попробуем после следующей пачки
+                logger.error(f"❌ Spool compaction failed: {e}")
+
+    async def _write(self, batch: List[SpoolRecord]):
+        """
+        Пишет пачку, пока не получится. Пачку не бросаем: следующие коммиты двигают last_seq вперед,
+        и пропущенные отчеты не повторились бы даже из спула.
+        """
+        delay = self.retry_delay
+        while True:
+            try:
+                await self._commit_or_split(batch)
+            except Exception as e:
+                # База занята/заблокирована или другой сбой — повторяем ту же пачку с паузой
+                # (уже записанные отчеты _commit_batch пропустит по seq)
+                if self._failing_since is None:
+                    self._failing_since = time.monotonic()
+                self._last_error = repr(e)
+                self.stats["retries"] += 1
+                logger.warning(f"⏳ Group commit failed ({len(batch)} reports), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                if self._failing_since is not None:
+                    logger.info(f"✅ Report writer recovered after {time.monotonic() - self._failing_since:.1f}s")
+                    self._failing_since = None
+                return
+
+    async def _commit_or_split(self, batch: List[SpoolRecord]):
+        try:
+            await self._commit_batch(batch)
+        except OperationalError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Group commit rejected ({len(batch)} reports), retrying one by one: {e}")
+            await self._commit_one_by_one(batch)
+
+    async def _commit_batch(self, batch: List[SpoolRecord]):
+        # Уже закоммиченные (например, повтор после падения) пропускаем
+        batch = [record for record in batch if record[0] > self._committed_seq]
+        if not batch:
+            return
+
+        last_seq = max(seq for seq, _, _ in batch)
+        async with self.session_factory() as session:
+            repo = ReportRepository(session)
+            for _, kind, payload in batch:
+                if kind == "doctor":
+                    await repo.add_doctor_report(**payload)
+                else:
+                    await repo.add_apothecary_report(**payload)
+
+            await session.execute(
+                text("UPDATE write_behind_state SET last_seq = MAX(last_seq, :seq) WHERE id = 1"), {"seq": last_seq}
+            )
+            await session.commit()
+
+        self._committed_seq = max(self._committed_seq, last_seq)
+        self.stats["committed"] += len(batch)
+        self.stats["batches"] += 1
+
+    async def _commit_one_by_one(self, batch: List[SpoolRecord]):
+        for record in sorted(batch, key=lambda r: r[0]):
+            if record[0] <= self._committed_seq:
+                continue
+            try:
+                await self._commit_batch([record])
+            except OperationalError:
+                # Занятая база — не повод отвергать отчет: пачка повторится целиком (_write)
+                raise
+            except Exception as e:
+                # Битую запись откладываем в .rejected, чтобы она не блокировала очередь навсегда
+                logger.critical(f"❌ Report #{record[0]} rejected by database: {e}")
+                self._reject(record)
+                await self._mark_committed(record[0])
+
+    async def _mark_committed(self, seq: int):
+        async with self.session_factory() as session:
+            await session.execute(
+                text("UPDATE write_behind_state SET last_seq = MAX(last_seq, :seq) WHERE id = 1"), {"seq": seq}
+            )
+            await session.commit()
+        self._committed_seq = max(self._committed_seq, seq)
+
+    def _reject(self, record: SpoolRecord):
+        seq, kind, payload = record
+        with open(f"{self.spool_path}.rejected", "a", encoding="utf-8") as f:
+            f.write(json.dumps({"seq": seq, "kind": kind, "payload": payload}, default=_json_default) + "\n")
+        self.stats["rejected"] += 1
+
+    # ==================================================
+    # 💾 СПУЛ
+    # ==================================================
+
+    async def _load_committed_seq(self) -> int:
+        async with self.session_factory() as session:
+            result = await session.execute(text("SELECT last_seq FROM write_behind_state WHERE id = 1"))
+            return result.scalar() or 0
+
+    def _read_spool(self) -> List[SpoolRecord]:
+        if not os.path.exists(self.spool_path):
+            return []
+
+        pending = []
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    raw = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная последняя строка (падение посреди write) — отчет не был подтвержден
+                    continue
+                if raw["seq"] > self._committed_seq:
+                    pending.append((raw["seq"], raw["kind"], _decode_payload(raw["payload"])))
+        return pending
+
+    def _rewrite_spool(self, records: List[SpoolRecord]):
+        tmp_path = f"{self.spool_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for seq, kind, payload in records:
+                f.write(json.dumps({"seq": seq, "kind": kind, "payload": payload}, default=_json_default) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    async def _maybe_compact_spool(self):
+        """Когда все принятые отчеты в базе — обнуляем спул, чтобы он не рос бесконечно"""
+        if not self._queue.empty():
+            return
+        async with self._spool_lock:
+            if self._seq == self._committed_seq and self._synced == self._written:
+                self._spool.flush()
+                self._spool.truncate(0)
+                self._spool.seek(0)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"__dt__": value.isoformat()}
+    raise TypeError(f"Unsupported type in report payload: {type(value)}")
+
+
+def _decode_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    decoded = {}
+    for key, value in payload.items():
+        if isinstance(value, dict) and "__dt__" in value:
+            value = datetime.fromisoformat(value["__dt__"])
+        decoded[key] = value
+    return decoded
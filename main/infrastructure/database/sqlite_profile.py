@@ -0,0 +1,90 @@
+from dataclasses import dataclass, replace
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    """
+    Набор PRAGMA и настроек пула, который применяется к КАЖДОМУ новому соединению.
+    Значения по умолчанию рассчитаны на пиковую запись отчетов (утро, много агентов).
+    """
+    enabled: bool = True
+    journal_mode: Optional[str] = "WAL"  # Читатели не блокируют писателя (None — не трогать)
+    synchronous: str = "NORMAL"        # В режиме WAL безопасно и в разы быстрее FULL
+    busy_timeout_ms: int = 5000        # Ждем блокировку, а не падаем с "database is locked"
+    cache_size_kib: int = 16384        # 16 МБ страничного кеша на соединение
+    mmap_size: int = 128 * 1024 * 1024
+    temp_store: str = "MEMORY"
+    query_only: bool = False
+
+    pool_size: int = 5
+    max_overflow: int = 5
+    pool_timeout: float = 30.0
+
+    @classmethod
+    def from_config(cls, config, prefix: str = "sqlite_") -> "SQLiteProfile":
+        """Собирает профиль из конфига: любое поле можно переопределить через sqlite_<поле>"""
+        overrides = {}
+        for field in cls.__dataclass_fields__:
+            value = getattr(config, f"{prefix}{field}", None)
+            if value is not None:
+                overrides[field] = value
+        return cls(**overrides)
+
+    def with_overrides(self, **changes) -> "SQLiteProfile":
+        return replace(self, **changes)
+
+    def pragmas(self) -> List[str]:
+        if not self.enabled:
+            return []
+
+        pragmas = []
+        if self.journal_mode:
+            # На read-only соединении сменить режим журнала нельзя, поэтому он опционален
+            pragmas.append(f"PRAGMA journal_mode={self.journal_mode}")
+
+        pragmas += [
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}",
+            # Отрицательное значение = размер в КиБ, а не в страницах
+            f"PRAGMA cache_size=-{int(self.cache_size_kib)}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            f"PRAGMA temp_store={self.temp_store}",
+        ]
+        if self.query_only:
+            pragmas.append("PRAGMA query_only=ON")
+        return pragmas
+
+
+def apply_profile(engine: AsyncEngine, profile: SQLiteProfile):
+    """Вешает PRAGMA на событие connect, чтобы их получало каждое соединение пула"""
+    pragmas = profile.pragmas()
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def create_sqlite_engine(url: str, profile: Optional[SQLiteProfile] = None, **kwargs) -> AsyncEngine:
+    """create_async_engine + явный размер пула + PRAGMA профиля"""
+    profile = profile or SQLiteProfile()
+
+    # Для :memory: SQLAlchemy использует StaticPool, размеры пула ему не передаются
+    if ":memory:" not in url:
+        kwargs.setdefault("pool_size", profile.pool_size)
+        kwargs.setdefault("max_overflow", profile.max_overflow)
+        kwargs.setdefault("pool_timeout", profile.pool_timeout)
+
+    engine = create_async_engine(url, **kwargs)
+    apply_profile(engine, profile)
+    return engine
@@ -0,0 +1,54 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.logger.logger_config import logger
+
+
+class CompiledCacheStats:
+    """
+    Счетчики кеша скомпилированных выражений SQLAlchemy (context.cache_hit):
+    hit — SQL взят из кеша, miss — скомпилирован и положен в кеш,
+    no_cache — выражение не кешируется (например, text() или сырой SQL).
+    """
+    # Как часто писать в лог долю попаданий
+    LOG_EVERY = 5000
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = {"hit": 0, "miss": 0, "no_cache": 0}
+
+    @property
+    def hit_ratio(self) -> float:
+        cached = self.stats["hit"] + self.stats["miss"]
+        return self.stats["hit"] / cached if cached else 0.0
+
+    def record(self, context):
+        dialect = context.dialect
+        if context.cache_hit == dialect.CACHE_HIT:
+            self.stats["hit"] += 1
+        elif context.cache_hit == dialect.CACHE_MISS:
+            self.stats["miss"] += 1
+        else:
+            self.stats["no_cache"] += 1
+
+        total = self.stats["hit"] + self.stats["miss"] + self.stats["no_cache"]
+        if total % self.LOG_EVERY == 0:
+            self.log()
+
+    def log(self):
+        logger.info(
+            f"🧮 Compiled cache [{self.name}]: hit ratio {self.hit_ratio:.1%} "
+            f"(hit={self.stats['hit']}, miss={self.stats['miss']}, no_cache={self.stats['no_cache']})"
+        )
+
+
+def track_compiled_cache(engine: AsyncEngine, name: str) -> CompiledCacheStats:
+    """Вешает счетчик попаданий в кеш компиляции на каждое выполнение запроса движком"""
+    stats = CompiledCacheStats(name)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _record_cache_hit(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            stats.record(context)
+
+    return stats
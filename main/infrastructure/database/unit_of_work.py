@@ -0,0 +1,66 @@
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.logger.logger_config import logger
+
+
+AFTER_COMMIT_KEY = "after_commit"
+ROLLBACK_ONLY_KEY = "rollback_only"
+
+
+def on_commit(session, callback: Callable[[], None]):
+    """
+    Откладывает callback до успешного commit сессии (коммитит DatabaseMiddleware).
+    Нужен кешам в памяти: они должны видеть только зафиксированные данные.
+    При rollback отложенные callback-и выбрасываются.
+    """
+    session.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+
+async def commit_now(session):
+    """
+    Фиксирует unit of work сразу, не дожидаясь конца апдейта.
+    Хэндлер вызывает его перед ответом пользователю «сохранено»: ответ уходит только после
+    успешного commit, а write-лок SQLite не держится на время запросов к Telegram.
+    При ошибке транзакция откатывается, исключение пробрасывается.
+    """
+    if not getattr(session, "materialized", True) or not session.in_transaction():
+        return
+    if session.info.get(ROLLBACK_ONLY_KEY):
+        raise RuntimeError("Unit of work is rollback-only")
+    try:
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+
+def set_rollback_only(session):
+    """
+    Хэндлер поймал ошибку базы и не пробросил ее — DatabaseMiddleware откатит апдейт вместо commit,
+    чтобы не зафиксировать половину записей (например, шапку отчета без препаратов).
+    """
+    if getattr(session, "materialized", True):
+        session.info[ROLLBACK_ONLY_KEY] = True
+
+
+def is_rollback_only(session) -> bool:
+    return bool(session.info.get(ROLLBACK_ONLY_KEY))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session):
+    callbacks = session.info.pop(AFTER_COMMIT_KEY, None)
+    for callback in callbacks or ():
+        try:
+            callback()
+        except Exception as e:
+            # Данные уже в базе — ошибка кеша не должна превращаться в ошибку апдейта
+            logger.error(f"❌ After-commit callback failed: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session: Session):
+    session.info.pop(AFTER_COMMIT_KEY, None)
@@ -1,7 +1,10 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from keyboard.inline.keyboard_cache import keyboard_cache
 
+
+@keyboard_cache.static
 def get_admin_menu() -> InlineKeyboardMarkup:
     """Главное меню администратора"""
     builder = InlineKeyboardBuilder()
@@ -16,6 +19,7 @@ def get_admin_menu() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@keyboard_cache.static
 def get_report_period_kb() -> InlineKeyboardMarkup:
     """Клавиатура выбора периода для отчета"""
     builder = InlineKeyboardBuilder()
@@ -50,4 +54,11 @@ def get_report_users_kb(users_list: list) -> InlineKeyboardMarkup:
     builder.button(text="🔙 Отмена", callback_data="admin_cancel")
     builder.adjust(1)
 
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+
+def get_export_progress_kb(job_id: int) -> InlineKeyboardMarkup:
+    """Кнопка отмены под сообщением с прогрессом выгрузки"""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="❌ Отменить выгрузку", callback_data=f"export_cancel_{job_id}")
+    return builder.as_markup()
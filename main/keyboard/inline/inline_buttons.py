@@ -1,14 +1,20 @@
-from typing import Sequence, Any
+from typing import Sequence
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from infrastructure.cache.territory_index import territory_index
+from infrastructure.database.dto import KeyboardItem, DoctorRow, RoadRow
+from keyboard.inline.keyboard_cache import keyboard_cache
 from utils.text.text_utils import shorten_name
 
 
 PAGE_SIZE = 6
 
+# Маршруты фиксированные (1–7)
+ROADS = [RoadRow(road_num=i) for i in range(1, 8)]
+
 async def build_keyboard_from_items(
-        items: Sequence[Any],
+        items: Sequence[KeyboardItem],
         prefix: str,
         state: FSMContext = None,
         row_width: int = 1,
@@ -16,45 +22,14 @@ async def build_keyboard_from_items(
         add_new_btn_callback: str = None
 ) -> InlineKeyboardMarkup:
     """
-    Строит клавиатуру из списка объектов ORM (SQLAlchemy).
+    Строит клавиатуру из строк dto (KeyboardItem): кнопка = label, callback = prefix_button_id.
     """
     builder = InlineKeyboardBuilder()
 
     for item in items:
-        try:
-            # 1. Умный поиск ID
-            if prefix in ["road", "a_road"]:
-                item_id = getattr(item, 'road_num', None)
-                text = f"Маршрут {item_id}"
-            else:
-                # Пытаемся найти id, если его нет — ищем специфичные (lpu_id, doc_id и т.д.)
-                item_id = getattr(item, 'id', None) or \
-                          getattr(item, 'lpu_id', None) or \
-                          getattr(item, f"{prefix}_id", None)
-
-                # Если ID так и не найден, пропускаем этот объект, чтобы не сломать бота
-                if item_id is None:
-                    print(f"⚠️ Ошибка: Не удалось найти ID для объекта {item}")
-                    continue
-
-                # Ищем стандартные имена в объектах SQLAlchemy
-                text = getattr(item, 'name', None) or \
-                       getattr(item, 'pharmacy_name', None) or \
-                       getattr(item, 'doctor', None) or \
-                       getattr(item, 'spec', None) or \
-                       getattr(item, 'prep', None) or \
-                       str(item_id)
-
-            # 2. Формируем Callback
-            callback_data = f"{prefix}_{item_id}"
-
-            # 3. Добавляем кнопку
-            display_text = shorten_name(text) if len(text) > 30 else text
-            builder.button(text=display_text, callback_data=callback_data)
-
-        except Exception as e:
-            print(f"Error building button for item {item}: {e}")
-            continue
+        text = item.label
+        display_text = shorten_name(text) if len(text) > 30 else text
+        builder.button(text=display_text, callback_data=f"{prefix}_{item.button_id}")
 
     builder.adjust(row_width)
 
@@ -77,6 +52,7 @@ async def build_keyboard_from_items(
 # === СТАТИЧНЫЕ МЕНЮ
 # ================================================================
 
+@keyboard_cache.static
 def get_confirm_inline(mode=False) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     if mode:
@@ -89,12 +65,14 @@ def get_confirm_inline(mode=False) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@keyboard_cache.static
 def get_cancel_inline() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="❌ Отменить", callback_data="back_to_main")
     return builder.as_markup()
 
 
+@keyboard_cache.static
 def get_reports_inline() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="🧾 Все отчёты", callback_data="report_all_view")
@@ -106,16 +84,16 @@ def get_reports_inline() -> InlineKeyboardMarkup:
 # === ДИНАМИЧЕСКИЕ МЕНЮ (VIEW LAYER)
 # ================================================================
 
-async def get_district_inline(items: Sequence[Any], state: FSMContext,
+async def get_district_inline(items: Sequence[KeyboardItem], state: FSMContext,
                               prefix: str = "district") -> InlineKeyboardMarkup:
     return await build_keyboard_from_items(items, prefix=prefix, state=state, row_width=2)
 
 
-async def get_road_inline(items: Sequence[Any], state: FSMContext, prefix: str = "road") -> InlineKeyboardMarkup:
+async def get_road_inline(items: Sequence[KeyboardItem], state: FSMContext, prefix: str = "road") -> InlineKeyboardMarkup:
     return await build_keyboard_from_items(items, prefix=prefix, state=state, row_width=3)
 
 
-async def get_lpu_inline(items: Sequence[Any], state: FSMContext) -> InlineKeyboardMarkup:
+async def get_lpu_inline(items: Sequence[KeyboardItem], state: FSMContext) -> InlineKeyboardMarkup:
     """Используем Фабрику для ЛПУ, сокращая код в 3 раза"""
     return await build_keyboard_from_items(
         items=items,
@@ -126,7 +104,7 @@ async def get_lpu_inline(items: Sequence[Any], state: FSMContext) -> InlineKeybo
     )
 
 
-async def get_apothecary_inline(items: Sequence[Any], state: FSMContext) -> InlineKeyboardMarkup:
+async def get_apothecary_inline(items: Sequence[KeyboardItem], state: FSMContext) -> InlineKeyboardMarkup:
     return await build_keyboard_from_items(
         items=items,
         prefix="apothecary",
@@ -136,20 +114,51 @@ async def get_apothecary_inline(items: Sequence[Any], state: FSMContext) -> Inli
     )
 
 
-async def get_specs_inline(specs: Sequence[Any]) -> InlineKeyboardMarkup:
+# ================================================================
+# === КЕШИРОВАННЫЕ МЕНЮ ТЕРРИТОРИЙ (версия = поколение territory_index)
+# ================================================================
+
+async def get_region_districts_inline(region: str, prefix: str = "district") -> InlineKeyboardMarkup:
+    """Районы региона из индекса территорий"""
+    return await keyboard_cache.versioned(
+        (prefix, region),
+        territory_index.generation,
+        lambda: get_district_inline(territory_index.get_districts_by_region(region), None, prefix=prefix)
+    )
+
+
+async def get_road_numbers_inline(prefix: str = "road") -> InlineKeyboardMarkup:
+    """Номера маршрутов фиксированы — разметка не зависит от данных"""
+    return await keyboard_cache.versioned((prefix,), 0, lambda: get_road_inline(ROADS, None, prefix=prefix))
+
+
+async def get_road_lpus_inline(road_id: int) -> InlineKeyboardMarkup:
+    return await keyboard_cache.versioned(
+        ("lpu", road_id),
+        territory_index.generation,
+        lambda: get_lpu_inline(territory_index.get_lpus_by_road(road_id), None)
+    )
+
+
+async def get_road_apothecaries_inline(road_id: int) -> InlineKeyboardMarkup:
+    return await keyboard_cache.versioned(
+        ("apothecary", road_id),
+        territory_index.generation,
+        lambda: get_apothecary_inline(territory_index.get_apothecaries_by_road(road_id), None)
+    )
+
+
+async def get_specs_inline(specs: Sequence[KeyboardItem]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for s in specs:
-        s_id = getattr(s, "id", None)
-        s_name = getattr(s, "spec", None)
-        if s_id is not None and s_name is not None:
-            builder.button(text=s_name, callback_data=f"spec_{s_id}")
+        builder.button(text=s.label, callback_data=f"spec_{s.button_id}")
     builder.adjust(2)
     return builder.as_markup()
 
 
 # 🔥 ВРАЧИ (Специфичная логика с пагинацией)
 async def get_doctors_inline(
-        doctors: Sequence[Any],
+        doctors: Sequence[DoctorRow],
         lpu_id: int,
         page: int = 1,
         state: FSMContext = None
@@ -163,17 +172,11 @@ async def get_doctors_inline(
     has_next = end_index < len(doctors)
 
     for doc in current_doctors:
-        d_name = getattr(doc, 'doctor', "Врач")
-
-        # Безопасная попытка вытащить специальность (если она загружена через relationship)
-        specialty = getattr(doc, 'specialty', None)
-        spec_name = getattr(specialty, 'spec', None) if specialty else None
-
-        btn_text = f"{d_name} ({spec_name})" if spec_name else d_name
+        btn_text = doc.label  # ФИО (специальность)
 
         # Защита от слишком длинных имен на кнопке
         display_text = shorten_name(btn_text) if len(btn_text) > 35 else btn_text
-        builder.button(text=display_text, callback_data=f"doc_{doc.id}")
+        builder.button(text=display_text, callback_data=f"doc_{doc.button_id}")
 
     builder.adjust(1)
 
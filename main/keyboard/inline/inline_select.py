@@ -1,79 +1,172 @@
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Sequence, Tuple
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.fsm.context import FSMContext
 
-# 🔥 НОВЫЙ ИМПОРТ
-from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
+from infrastructure.cache.medication_catalog import CatalogSnapshot
+
+
+# Нижняя панель одинаковая для всех клавиатур выбора
+_FOOTER_ROWS = [
+    [
+        InlineKeyboardButton(text="🔄 Сброс", callback_data="reset_selection"),
+        InlineKeyboardButton(text="💾 Сохранить", callback_data="confirm_selection"),
+    ],
+    [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_main")],
+]
+
+
+def _option_text(name: str, is_selected: bool) -> str:
+    icon = "✅" if is_selected else "⬜"
+    text = f"{icon} {name}"
 
+    # Защита от слишком длинных названий (Telegram ругается на кнопки > 64 символов)
+    if len(text) > 35:
+        text = text[:32] + "..."
+    return text
 
-def build_multi_select_keyboard(options: list, selected_ids: list, prefix: str) -> InlineKeyboardMarkup:
+
+def build_multi_select_keyboard(
+        options: Sequence[Tuple[int, str]],
+        selected_ids: list,
+        prefix: str
+) -> InlineKeyboardMarkup:
     """
-    Генерация клавиатуры с чекбоксами. Поддерживает как ORM-объекты, так и кортежи (id, name).
+    Генерация клавиатуры с чекбоксами из пар (id, name): items справочника medication_catalog
+    или строки PrepRow из репозитория. Без кеша — для справочника есть get_multi_select_keyboard.
     """
     builder = InlineKeyboardBuilder()
     selected_set = {str(x) for x in selected_ids}
 
-    for item in options:
-        # 1. Умная распаковка данных
-        if isinstance(item, tuple) and len(item) == 2:
-            # Если это кортеж из нашей функции ensure_prep_items_loaded
-            opt_id, name = item
-        else:
-            # Если это ORM-объект напрямую из базы
-            try:
-                opt_id = getattr(item, "id")
-                name = getattr(item, "prep", getattr(item, "name", "Unknown"))
-            except AttributeError:
-                print(f"⚠️ Ошибка: невозможно прочитать данные препарата: {item}")
-                continue
-
-        # 2. Статус чекбокса
-        is_selected = str(opt_id) in selected_set
-
-        icon = "✅" if is_selected else "⬜"
-        text = f"{icon} {name}"
-
-        # Защита от слишком длинных названий (Telegram ругается на кнопки > 64 символов)
-        if len(text) > 35:
-            text = text[:32] + "..."
-
+    for opt_id, name in options:
         # callback: select_doc_5
-        callback_data = f"select_{prefix}_{opt_id}"
-
-        builder.button(text=text, callback_data=callback_data)
+        builder.button(text=_option_text(name, str(opt_id) in selected_set), callback_data=f"select_{prefix}_{opt_id}")
 
     builder.adjust(1)
 
-    # 3. Нижняя панель управления
-    builder.row(
-        InlineKeyboardButton(text="🔄 Сброс", callback_data="reset_selection"),
-        InlineKeyboardButton(text="💾 Сохранить", callback_data="confirm_selection")
-    )
-
-    # 4. Кнопка Назад
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_main")
-    )
+    for row in _FOOTER_ROWS:
+        builder.row(*row)
 
     return builder.as_markup()
 
 
-async def get_prep_inline(
-        pharmacy_repo: PharmacyRepository,  # <-- Перешли на репозиторий
-        state: FSMContext,
-        prefix: str
-) -> InlineKeyboardMarkup:
+# ==================================================
+# ☑️ МУЛЬТИ-ВЫБОР ИЗ СПРАВОЧНИКА (готовые строки на версию)
+# ==================================================
+
+class MultiSelectTemplate:
     """
-    Асинхронный загрузчик списка препаратов.
+    Строки клавиатуры для одной версии справочника и одного prefix:
+    у каждого препарата заранее собраны обе кнопки (⬜ и ✅).
+    Клавиатура — это выбор готовой строки по ID, тап переставляет одну строку.
     """
-    # 1. Получаем список из БД через новый метод
-    items = await pharmacy_repo.get_preps()
-
-    # 2. Сохраняем контекст в нативный FSM
-    await state.update_data(prefix=prefix)
 
-    # 3. Получаем уже выбранные элементы
-    data = await state.get_data()
-    selected = data.get("selected_items", [])
-
-    return build_multi_select_keyboard(items, selected, prefix)
\ No newline at end of file
+    def __init__(self, catalog: CatalogSnapshot, prefix: str):
+        self.ids = tuple(opt_id for opt_id, _ in catalog.items)
+        self.positions: Dict[int, int] = {opt_id: i for i, opt_id in enumerate(self.ids)}
+        self.rows: Tuple[Tuple[list, list], ...] = tuple(
+            (
+                [InlineKeyboardButton(text=_option_text(name, False), callback_data=f"select_{prefix}_{opt_id}")],
+                [InlineKeyboardButton(text=_option_text(name, True), callback_data=f"select_{prefix}_{opt_id}")],
+            )
+            for opt_id, name in catalog.items
+        )
+
+    def render(self, selected: FrozenSet[int]) -> InlineKeyboardMarkup:
+        rows = [pair[opt_id in selected] for opt_id, pair in zip(self.ids, self.rows)]
+        return _markup(rows + _FOOTER_ROWS)
+
+    def flip(self, markup: InlineKeyboardMarkup, option_id: int, is_selected: bool) -> InlineKeyboardMarkup:
+        """Та же клавиатура, у которой заменена только строка option_id"""
+        position = self.positions.get(option_id)
+        if position is None:
+            return markup
+        rows = list(markup.inline_keyboard)
+        rows[position] = self.rows[position][is_selected]
+        return _markup(rows)
+
+
+def _markup(rows: list) -> InlineKeyboardMarkup:
+    # Кнопки уже провалидированы при создании шаблона — повторная валидация 500 строк не нужна
+    return InlineKeyboardMarkup.model_construct(inline_keyboard=rows)
+
+
+class MultiSelectCache:
+    """
+    Шаблоны по (версия справочника, prefix) и готовые клавиатуры по (версия, prefix, выбранные ID).
+    Разметки общие для всех апдейтов и не меняются на месте.
+    """
+    MAX_TEMPLATES = 8
+    MAX_MARKUPS = 512
+
+    def __init__(self):
+        self._templates: "OrderedDict[Tuple[int, str], MultiSelectTemplate]" = OrderedDict()
+        self._markups: "OrderedDict[Tuple[int, str, FrozenSet[int]], InlineKeyboardMarkup]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "flips": 0}
+
+    def template(self, catalog: CatalogSnapshot, prefix: str) -> MultiSelectTemplate:
+        key = (catalog.version, prefix)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = MultiSelectTemplate(catalog, prefix)
+            while len(self._templates) > self.MAX_TEMPLATES:
+                self._templates.popitem(last=False)
+        return template
+
+    def get(self, catalog: CatalogSnapshot, selected: FrozenSet[int], prefix: str) -> InlineKeyboardMarkup:
+        key = (catalog.version, prefix, selected)
+        markup = self._markups.get(key)
+        if markup is not None:
+            self.stats["hits"] += 1
+            self._markups.move_to_end(key)
+            return markup
+
+        self.stats["misses"] += 1
+        return self._put(key, self.template(catalog, prefix).render(selected))
+
+    def toggle(
+            self,
+            catalog: CatalogSnapshot,
+            selected_before: FrozenSet[int],
+            option_id: int,
+            prefix: str
+    ) -> InlineKeyboardMarkup:
+        selected = selected_before ^ {option_id}
+        key = (catalog.version, prefix, selected)
+        markup = self._markups.get(key)
+        if markup is not None:
+            self.stats["hits"] += 1
+            self._markups.move_to_end(key)
+            return markup
+
+        previous = self._markups.get((catalog.version, prefix, selected_before))
+        if previous is None:
+            return self.get(catalog, selected, prefix)
+
+        self.stats["flips"] += 1
+        return self._put(key, self.template(catalog, prefix).flip(previous, option_id, option_id in selected))
+
+    def _put(self, key, markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+        self._markups[key] = markup
+        while len(self._markups) > self.MAX_MARKUPS:
+            self._markups.popitem(last=False)
+        return markup
+
+
+multi_select_cache = MultiSelectCache()
+
+
+def get_multi_select_keyboard(catalog: CatalogSnapshot, selected_ids: Iterable, prefix: str) -> InlineKeyboardMarkup:
+    """Клавиатура выбора препаратов из версии справочника (готовая, если такой выбор уже рисовали)"""
+    return multi_select_cache.get(catalog, frozenset(int(x) for x in selected_ids), prefix)
+
+
+def toggle_multi_select_keyboard(
+        catalog: CatalogSnapshot,
+        selected_before: Iterable,
+        option_id: int,
+        prefix: str
+) -> InlineKeyboardMarkup:
+    """Клавиатура после тапа по option_id: из предыдущей меняется одна строка"""
+    return multi_select_cache.toggle(catalog, frozenset(int(x) for x in selected_before), option_id, prefix)
@@ -0,0 +1,69 @@
+import functools
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+
+class KeyboardCache:
+    """
+    Готовые разметки клавиатур.
+    Статичные меню строятся один раз на процесс (на каждый набор аргументов),
+    списочные (районы региона, ЛПУ/аптеки маршрута) — один раз на версию данных
+    и пересобираются, только когда версия сменилась.
+    Разметка общая для всех апдейтов: модели aiogram frozen, строки кнопок никто не меняет.
+    """
+    # Районы всех регионов + ЛПУ/аптеки всех маршрутов с запасом
+    MAX_ENTRIES = 2048
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._static: Dict[Hashable, InlineKeyboardMarkup] = {}
+        self._versioned: "OrderedDict[Hashable, Tuple[int, InlineKeyboardMarkup]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def static(self, build: Callable[..., InlineKeyboardMarkup]):
+        """Декоратор для построителей статичных меню"""
+
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            key = (build.__qualname__, args, tuple(sorted(kwargs.items())))
+            markup = self._static.get(key)
+            if markup is None:
+                self.stats["misses"] += 1
+                markup = self._static[key] = build(*args, **kwargs)
+            else:
+                self.stats["hits"] += 1
+            return markup
+
+        # Для бенчмарков и отладки: построение без кеша
+        wrapper.uncached = build
+        return wrapper
+
+    async def versioned(
+            self,
+            key: Hashable,
+            version: int,
+            build: Callable[[], Awaitable[InlineKeyboardMarkup]]
+    ) -> InlineKeyboardMarkup:
+        """Разметка для key, построенная на этой версии данных; иначе строит и запоминает новую"""
+        entry = self._versioned.get(key)
+        if entry is not None and entry[0] == version:
+            self.stats["hits"] += 1
+            self._versioned.move_to_end(key)
+            return entry[1]
+
+        self.stats["misses"] += 1
+        markup = await build()
+        self._versioned[key] = (version, markup)
+        self._versioned.move_to_end(key)
+        while len(self._versioned) > self.max_entries:
+            self._versioned.popitem(last=False)
+        return markup
+
+    def clear(self):
+        self._static.clear()
+        self._versioned.clear()
+
+
+keyboard_cache = KeyboardCache()
@@ -3,6 +3,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 # 🔥 НОВЫЙ ИМПОРТ РЕПОЗИТОРИЯ
 from infrastructure.database.repo.report_repo import ReportRepository
+from keyboard.inline.keyboard_cache import keyboard_cache
 from utils.logger.logger_config import logger
 
 
@@ -56,6 +57,7 @@ async def get_main_menu_inline(user_id: int, reports_db: ReportRepository) -> In
     return builder.as_markup()
 
 
+@keyboard_cache.static
 def get_guest_menu_inline() -> InlineKeyboardMarkup:
     """Menu for Guests"""
     builder = InlineKeyboardBuilder()
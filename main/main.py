@@ -17,14 +17,27 @@ from handlers.tasks import tasks
 from handlers.callbacks import geo_callbacks, main_menu_callbacks, med_objects_callbacks, shared_callbacks
 
 from infrastructure.database.db_helper import db_helper
+from infrastructure.cache.territory_index import territory_index
+from infrastructure.cache.medication_catalog import medication_catalog
+from infrastructure.cache.task_state import task_state
+from utils.report.render_pool import render_pool
+from utils.report.export_jobs import export_jobs
+from utils.report.export_cache import export_cache
 
 
 async def main():
     logger.info("🚀 Starting AnovaPharmBot...")
 
-    # 🔥 СОЗДАЕМ ТАБЛИЦЫ ПЕРЕД ЗАПУСКОМ РОУТЕРОВ
+    # 🔥 ПРИМЕНЯЕМ МИГРАЦИИ ПЕРЕД ЗАПУСКОМ РОУТЕРОВ
     logger.info("🛠 Initializing databases...")
     await db_helper.init_db()
+    await territory_index.load(db_helper.session_factory)
+    await medication_catalog.load(db_helper.session_factory)
+    medication_catalog.start_refresh(db_helper.session_factory, getattr(config, "medication_refresh_interval", 300))
+    await task_state.load(db_helper.session_factory)
+    if db_helper.report_queue:
+        await db_helper.report_queue.start()
+    await export_jobs.start()
 
     dp.workflow_data.update({
         "config": config
@@ -63,6 +76,12 @@ async def main():
         await dp.start_polling(bot)
     finally:
         logger.info("🛑 Stopping bot...")
+        if db_helper.report_queue:
+            await db_helper.report_queue.stop()
+        await export_jobs.stop()
+        await medication_catalog.stop_refresh()
+        export_cache.clear()
+        render_pool.shutdown()
         await bot.session.close()
 
 
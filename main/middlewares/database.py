@@ -3,21 +3,71 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 
 from infrastructure.database.db_helper import db_helper
+from infrastructure.database.lazy_session import LazySession
 from infrastructure.database.repo.user_repo import UserRepository
 from infrastructure.database.repo.pharmacy_repo import PharmacyRepository
 from infrastructure.database.repo.report_repo import ReportRepository
+from infrastructure.database.unit_of_work import is_rollback_only
+from utils.logger.logger_config import logger
 
 
 class DatabaseMiddleware(BaseMiddleware):
+    # Как часто писать в лог статистику апдейтов без обращения к БД
+    STATS_LOG_EVERY = 1000
+
+    def __init__(self):
+        self.stats = {"updates": 0, "without_db": 0}
+
     async def __call__(
             self,
             handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
             event: TelegramObject,
             data: Dict[str, Any]
     ) -> Any:
-        async with db_helper.session_factory() as session:
-            data["user_repo"] = UserRepository(session)
-            data["pharmacy_repo"] = PharmacyRepository(session)
-            data["reports_db"] = ReportRepository(session)
+        # Сессия ленивая: создается при первом запросе репозитория к базе
+        session = LazySession(db_helper.session_factory)
+
+        data["user_repo"] = UserRepository(session)
+        data["pharmacy_repo"] = PharmacyRepository(session)
+        data["reports_db"] = ReportRepository(session)
+
+        # Unit of work: репозитории только flush-ат, фиксируем все записи апдейта одним commit
+        # (хэндлер может зафиксировать раньше через commit_now — перед ответом «сохранено»)
+        try:
+            result = await handler(event, data)
+        except Exception:
+            if session.materialized:
+                await session.rollback()
+            raise
+        else:
+            await self._commit(session)
+            return result
+        finally:
+            used_db = session.materialized
+            await session.close()
+            self._count(used_db)
+
+    @staticmethod
+    async def _commit(session: LazySession):
+        if not session.materialized or not session.in_transaction():
+            return
+        if is_rollback_only(session):
+            logger.warning("⚠️ Unit of work marked rollback-only by handler, rolling back")
+            await session.rollback()
+            return
+        try:
+            await session.commit()
+        except Exception as e:
+            logger.error(f"❌ Unit of work commit failed, rolling back: {e}")
+            await session.rollback()
+            raise
+
+    def _count(self, used_db: bool):
+        self.stats["updates"] += 1
+        if not used_db:
+            self.stats["without_db"] += 1
 
-            return await handler(event, data)
\ No newline at end of file
+        if self.stats["updates"] % self.STATS_LOG_EVERY == 0:
+            logger.info(
+                f"📉 DB middleware: {self.stats['without_db']}/{self.stats['updates']} updates served without a DB session"
+            )
@@ -0,0 +1,93 @@
+"""
+Планы запросов репозиториев: горячие выборки должны идти через индексы миграции v0002,
+чтобы полный просмотр таблицы не вернулся незаметно.
+Запуск из main/: python -m pytest tests
+"""
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import sqlite
+
+from infrastructure.database.migrations.migrator import upgrade_to_head
+from infrastructure.database.repo.pharmacy_repo import _DOCTORS_BY_LPU, _LPUS_BY_ROAD
+from infrastructure.database.repo.report_repo import (
+    _APOTHECARY_EXPORT, _DOCTOR_EXPORT, _LAST_DOCTOR_REPORT_BY_NAMES, ReportRepository
+)
+from infrastructure.database.repo.user_repo import _USER_BY_NAME
+from infrastructure.database.models.reports import ApothecaryReport, MainReport
+from infrastructure.database.sqlite_profile import SQLiteProfile, create_sqlite_engine
+
+_DIALECT = sqlite.dialect(paramstyle="qmark")
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "bot.db"
+
+    async def migrate():
+        engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", SQLiteProfile())
+        try:
+            await upgrade_to_head(engine)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(migrate())
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def query_plan(conn: sqlite3.Connection, stmt, **params) -> str:
+    """EXPLAIN QUERY PLAN для выражения SQLAlchemy в том виде, в каком его выполнит репозиторий"""
+    compiled = stmt.compile(dialect=_DIALECT)
+    values = compiled.construct_params(params)
+    args = [str(values[name]) if isinstance(values[name], datetime) else values[name] for name in compiled.positiontup]
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {compiled}", args).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_last_doctor_report_by_names_uses_user_doc_date(db):
+    plan = query_plan(db, _LAST_DOCTOR_REPORT_BY_NAMES, user_name="rep", doctor_name="Иванов")
+    assert "SEARCH main_reports USING INDEX ix_main_reports_user_doc_date" in plan
+
+
+def test_doctor_export_for_user_uses_user_date(db):
+    conditions = ReportRepository._period_conditions(MainReport, "2025-01-01", "2025-01-31", "rep")
+    plan = query_plan(db, _DOCTOR_EXPORT.where(*conditions))
+    assert "SEARCH main_reports USING INDEX ix_main_reports_user_date" in plan
+
+
+def test_doctor_export_for_period_uses_date(db):
+    conditions = ReportRepository._period_conditions(MainReport, "2025-01-01", "2025-01-31", "all")
+    plan = query_plan(db, _DOCTOR_EXPORT.where(*conditions))
+    assert "SEARCH main_reports USING INDEX ix_main_reports_date" in plan
+
+
+def test_apothecary_export_for_user_uses_user_date(db):
+    conditions = ReportRepository._period_conditions(ApothecaryReport, "2025-01-01", "2025-01-31", "rep")
+    plan = query_plan(db, _APOTHECARY_EXPORT.where(*conditions))
+    assert "SEARCH apothecary_report USING INDEX ix_apothecary_report_user_date" in plan
+
+
+def test_apothecary_export_for_period_uses_date(db):
+    conditions = ReportRepository._period_conditions(ApothecaryReport, "2025-01-01", "2025-01-31", "all")
+    plan = query_plan(db, _APOTHECARY_EXPORT.where(*conditions))
+    assert "SEARCH apothecary_report USING INDEX ix_apothecary_report_date" in plan
+
+
+def test_doctors_by_lpu_uses_lpu_id(db):
+    plan = query_plan(db, _DOCTORS_BY_LPU, lpu_id=7)
+    assert "SEARCH doctors USING INDEX ix_doctors_lpu_id" in plan
+
+
+def test_lpus_by_road_uses_road_id(db):
+    plan = query_plan(db, _LPUS_BY_ROAD, road_id=12)
+    assert "SEARCH lpu USING INDEX ix_lpu_road_id" in plan
+
+
+def test_user_by_name_uses_user_name(db):
+    plan = query_plan(db, _USER_BY_NAME, username="rep")
+    assert "SEARCH users USING INDEX ix_users_user_name" in plan
+
@@ -0,0 +1,90 @@
+"""
+Сборка .xlsx через RenderPool не должна останавливать event loop: пока книга рендерится,
+корутина-«агент» продолжает просыпаться вовремя. Если рендер вернется прямо в loop,
+задержка тика станет равна времени сборки и тест упадет.
+Запуск из main/: python -m pytest tests
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from utils.report.excel_generator import ExcelReportWriter, render_workbook
+from utils.report.render_pool import RenderPool
+
+ROWS = 4000
+CHUNK = 500
+TICK = 0.01
+
+
+def doctor_chunks(rows: int):
+    now = datetime(2025, 1, 15, 10, 30)
+    for start in range(0, rows, CHUNK):
+        yield [
+            (i, now, "rep_1", "Алмалинский", 3, "Городская поликлиника №5", f"Иванов Иван Иванович {i}",
+             "Терапевт", None, "Предоплата", "Аспирин, Нурофен, Парацетамол", None if i % 3 else "Комментарий")
+            for i in range(start, min(rows, start + CHUNK))
+        ]
+
+
+def apothecary_chunks(rows: int):
+    now = datetime(2025, 1, 15, 10, 30)
+    for start in range(0, rows, CHUNK):
+        yield [
+            (i, now, "rep_1", "Алмалинский", 3, "Аптека №12", "Аспирин", i % 7, i % 5, None)
+            for i in range(start, min(rows, start + CHUNK))
+        ]
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = ExcelReportWriter(str(tmp_path))
+    for chunk in doctor_chunks(ROWS * 4 // 5):
+        writer.doctors.write(chunk)
+    for chunk in apothecary_chunks(ROWS - ROWS * 4 // 5):
+        writer.apothecaries.write(chunk)
+    yield writer
+    writer.close()
+
+
+async def render_with_ticker(render) -> float:
+    """Максимальное опоздание тика (с), пока выполняется render()"""
+    lags, stop = [], asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 3)
+    try:
+        await render()
+    finally:
+        stop.set()
+        await task
+    return max(lags)
+
+
+def test_render_pool_keeps_loop_responsive(writer):
+    # Эталон: та же книга, собранная прямо в вызывающем потоке
+    path = writer.new_path()
+    started = time.perf_counter()
+    render_workbook(writer.sheets, path)
+    inline_seconds = time.perf_counter() - started
+    os.remove(path)
+
+    pool = RenderPool(max_workers=1, use_processes=False)
+    path = writer.new_path()
+    try:
+        max_lag = asyncio.run(render_with_ticker(lambda: pool.run(render_workbook, writer.sheets, path)))
+    finally:
+        pool.shutdown()
+
+    assert os.path.getsize(path) > 0
+    os.remove(path)
+    # Рендер в loop дал бы опоздание во все время сборки; в пуле loop отдает управление каждые несколько мс
+    assert max_lag < inline_seconds / 3, f"loop lag {max_lag * 1000:.0f} ms, inline render {inline_seconds * 1000:.0f} ms"
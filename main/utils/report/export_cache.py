@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import uuid
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Hashable, NamedTuple, Optional, Tuple
+
+from utils.config.config import config
+from utils.logger.logger_config import logger
+
+
+class CachedExport(NamedTuple):
+    watermark: Tuple
+    path: str  # Копия .xlsx в каталоге кеша — на случай, если file_id не примут
+    size: int
+    rows: int
+    file_id: Optional[str] = None  # Документ, уже загруженный в Telegram
+
+
+class ExportResultCache:
+    """
+    Готовые выгрузки. Ключ — ExportRequest.key (тип, период, фильтр по сотруднику);
+    запись годна, пока не сменилась версия данных (ReportRepository.get_export_watermark).
+    Повтор той же выгрузки уходит по file_id без рендера и без загрузки файла.
+    Файлы лежат в собственном подкаталоге процесса внутри cache_dir (чужие файлы и кеши других
+    экземпляров бота не трогаем); когда суммарный размер больше max_bytes, вытесняются
+    давно не запрошенные (LRU). Подкаталог удаляется в clear() при остановке.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 200 * 1024 * 1024, max_entries: int = 64):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "export_cache")
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedExport]" = OrderedDict()
+        self._bytes = 0
+        self._dir: Optional[str] = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable, watermark: Tuple) -> Optional[CachedExport]:
+        entry = self._entries.get(key)
+        if entry is None or entry.watermark != watermark:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, watermark: Tuple, path: str, rows: int, file_id: Optional[str] = None) -> bool:
+        """Забирает файл выгрузки в кеш (перемещает). False — файл больше всего лимита, не кешируем"""
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return False
+
+        self.discard(key)
+        cached_path = os.path.join(self._ensure_dir(), f"{uuid.uuid4().hex}.xlsx")
+        shutil.move(path, cached_path)
+
+        self._entries[key] = CachedExport(watermark, cached_path, size, rows, file_id)
+        self._bytes += size
+        self._evict()
+        return True
+
+    def set_file_id(self, key: Hashable, file_id: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = entry._replace(file_id=file_id)
+
+    def discard(self, key: Hashable, path: Optional[str] = None):
+        """Убирает запись; с path — только если запись все еще указывает на этот файл"""
+        entry = self._entries.get(key)
+        if entry is None or (path is not None and entry.path != path):
+            return
+        del self._entries[key]
+        self._remove(entry)
+
+    def clear(self):
+        while self._entries:
+            self._remove(self._entries.popitem()[1])
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def _evict(self):
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            self.stats["evictions"] += 1
+            self._remove(self._entries.popitem(last=False)[1])
+
+    def _remove(self, entry: CachedExport):
+        self._bytes -= entry.size
+        with suppress(FileNotFoundError):
+            os.remove(entry.path)
+
+    def _ensure_dir(self) -> str:
+        if self._dir is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Свой подкаталог на процесс: удаляем только то, что сами создали
+            self._dir = tempfile.mkdtemp(prefix="export-cache-", dir=self.cache_dir)
+            logger.info(f"🗂 Export cache: {self._dir}, up to {self.max_bytes // (1024 * 1024)} MB")
+        return self._dir
+
+
+export_cache = ExportResultCache(
+    cache_dir=getattr(config, "export_cache_dir", None),
+    max_bytes=getattr(config, "export_cache_max_mb", 200) * 1024 * 1024,
+    max_entries=getattr(config, "export_cache_max_entries", 64),
+)
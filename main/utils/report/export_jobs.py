@@ -0,0 +1,304 @@
+import asyncio
+import itertools
+import os
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import FSInputFile
+
+from infrastructure.database.db_helper import db_helper
+from infrastructure.database.repo.report_repo import ReportRepository
+from keyboard.inline.admin_kb import get_admin_menu, get_export_progress_kb
+from utils.config.config import config
+from utils.logger.logger_config import logger
+from utils.report.excel_generator import create_excel_report_from_stream
+from utils.report.export_cache import CachedExport, export_cache
+
+
+class ExportRequest(NamedTuple):
+    """Что выгружать. Без дат — вся база (kind = "alltime")"""
+    start_date: Optional[str]
+    end_date: Optional[str]
+    user_name: str
+    filename: str
+    caption: str
+    empty_text: str
+
+    @property
+    def kind(self) -> str:
+        return "period" if self.start_date else "alltime"
+
+    @property
+    def key(self) -> Tuple:
+        # Одинаковый период и фильтр от разных админов — одна задача
+        return self.kind, self.start_date, self.end_date, self.user_name
+
+
+class Subscriber(NamedTuple):
+    chat_id: int
+    message_id: int  # Сообщение «⏳ Формирую...», которое обновляем прогрессом
+
+
+@dataclass
+class ExportJob:
+    id: int
+    request: ExportRequest
+    bot: Bot
+    subscribers: List[Subscriber] = field(default_factory=list)
+    rows: int = 0
+    stage: str = "в очереди"
+    task: Optional[asyncio.Task] = None
+    cancelled: bool = False
+    last_progress: float = 0.0
+
+
+class ExportQueueFull(Exception):
+    pass
+
+
+class ExportJobManager:
+    """
+    Фоновые выгрузки для админки.
+    Хэндлер только ставит задачу в ограниченную очередь и сразу отвечает; выгрузку выполняют
+    max_concurrent воркеров, так что тяжелые экспорты не копятся в диспетчере и не отнимают
+    ресурсы у агентов. Одинаковые запросы (период + сотрудник) склеиваются в одну задачу,
+    прогресс пишется в сообщения всех подписчиков, у каждого есть кнопка отмены.
+    """
+    # Не чаще, чем раз в столько секунд, правим сообщения с прогрессом (лимиты Telegram)
+    PROGRESS_EVERY = 3.0
+
+    def __init__(self, max_concurrent: int = 1, queue_size: int = 10):
+        self.max_concurrent = max_concurrent
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._jobs: Dict[int, ExportJob] = {}
+        self._by_key: Dict[Tuple, ExportJob] = {}
+        self._ids = itertools.count(1)
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_concurrent)]
+        logger.info(f"📦 Export jobs started: {self.max_concurrent} worker(s), queue {self._queue.maxsize}")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            with suppress(asyncio.CancelledError):
+                await worker
+        self._workers = []
+
+    # ==================================================
+    # 📥 ПОСТАНОВКА И ОТМЕНА
+    # ==================================================
+
+    def submit(self, request: ExportRequest, bot: Bot, subscriber: Subscriber) -> Tuple[ExportJob, bool]:
+        """(задача, новая ли). Если такая выгрузка уже идет — подписываемся на нее"""
+        job = self._by_key.get(request.key)
+        if job is not None:
+            job.subscribers.append(subscriber)
+            return job, False
+
+        job = ExportJob(id=next(self._ids), request=request, bot=bot, subscribers=[subscriber])
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ExportQueueFull() from None
+
+        self._jobs[job.id] = job
+        self._by_key[request.key] = job
+        return job, True
+
+    async def serve_cached(self, request: ExportRequest, bot: Bot, subscriber: Subscriber) -> bool:
+        """Если такая выгрузка уже есть в export_cache и данные не менялись — отдает ее сразу, мимо очереди"""
+        await db_helper.refresh_snapshot()
+        async with db_helper.read_session_factory() as session:
+            watermark = await ReportRepository(session).get_export_watermark(
+                request.start_date, request.end_date, request.user_name
+            )
+
+        entry = export_cache.get(request.key, watermark)
+        if entry is None:
+            return False
+
+        job = ExportJob(id=0, request=request, bot=bot, subscribers=[subscriber])
+        return await self._deliver_cached(job, entry)
+
+    def cancel(self, job_id: int, chat_id: int) -> bool:
+        """Отписывает чат; задача отменяется, когда отписались все"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+
+        job.subscribers = [s for s in job.subscribers if s.chat_id != chat_id]
+        if not job.subscribers:
+            job.cancelled = True
+            # Ждущую в очереди задачу воркер просто пропустит
+            self._forget(job)
+            if job.task is not None:
+                job.task.cancel()
+        return True
+
+    def _forget(self, job: ExportJob):
+        self._jobs.pop(job.id, None)
+        if self._by_key.get(job.request.key) is job:
+            del self._by_key[job.request.key]
+
+    # ==================================================
+    # ⚙️ ВЫПОЛНЕНИЕ
+    # ==================================================
+
+    async def _worker(self, n: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.cancelled:
+                    continue
+                job.task = asyncio.create_task(self._run(job))
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    # Отменили задачу (все подписчики нажали «Отменить») — берем следующую;
+                    # отменили сам воркер (остановка бота) — останавливаем и задачу
+                    if not job.cancelled:
+                        job.task.cancel()
+                        raise
+            except Exception as e:
+                logger.error(f"❌ Export job #{job.id} failed: {e}")
+                await self._notify(job, f"❌ Ошибка выгрузки: {e}")
+            finally:
+                self._forget(job)
+                self._queue.task_done()
+
+    async def _run(self, job: ExportJob):
+        request = job.request
+        started = time.monotonic()
+        excel_path = None
+        try:
+            job.stage = "читаю базу"
+            await self._progress(job, force=True)
+
+            await db_helper.refresh_snapshot()
+            async with db_helper.read_session_factory() as session:
+                repo = ReportRepository(session)
+                # Версия данных читается в той же сессии, что и строки, — кеш не разойдется с файлом
+                watermark = await repo.get_export_watermark(request.start_date, request.end_date, request.user_name)
+                entry = export_cache.get(request.key, watermark)
+                if entry is not None and await self._deliver_cached(job, entry):
+                    return
+
+                excel_path, rows = await create_excel_report_from_stream(
+                    self._counted(job, repo.stream_doctor_export(request.start_date, request.end_date, request.user_name)),
+                    self._counted(job, repo.stream_apothecary_export(request.start_date, request.end_date, request.user_name)),
+                    on_render=lambda: self._set_stage(job, "собираю файл"),
+                )
+
+            if not rows:
+                return await self._notify(job, request.empty_text)
+
+            file_id = await self._deliver(job, excel_path)
+            # Файл переезжает в кеш (отправлен уже из временного пути — вытеснение его не заденет)
+            export_cache.put(request.key, watermark, excel_path, rows, file_id)
+            logger.info(f"📦 Export job #{job.id} {request.key}: {rows} rows in {time.monotonic() - started:.1f}s")
+        finally:
+            # Без await после последней рассылки: кто подпишется дальше, получит новую задачу
+            # (из кеша), а не ту, что уже закончила отправку
+            self._forget(job)
+            if excel_path:
+                with suppress(FileNotFoundError):
+                    os.remove(excel_path)
+
+    async def _counted(self, job: ExportJob, chunks: AsyncIterator[list]) -> AsyncIterator[list]:
+        async for chunk in chunks:
+            job.rows += len(chunk)
+            await self._progress(job)
+            yield chunk
+
+    async def _set_stage(self, job: ExportJob, stage: str):
+        job.stage = stage
+        await self._progress(job, force=True)
+
+    async def _progress(self, job: ExportJob, force: bool = False):
+        now = time.monotonic()
+        if not force and now - job.last_progress < self.PROGRESS_EVERY:
+            return
+        job.last_progress = now
+
+        text = (
+            f"⏳ <b>Формирую выгрузку...</b>\n"
+            f"Этап: {job.stage}\n"
+            f"Строк обработано: {job.rows}"
+        )
+        for sub in list(job.subscribers):
+            with suppress(TelegramAPIError):
+                await job.bot.edit_message_text(
+                    text, chat_id=sub.chat_id, message_id=sub.message_id,
+                    reply_markup=get_export_progress_kb(job.id)
+                )
+
+    async def _deliver(self, job: ExportJob, excel_path: str, file_id: Optional[str] = None) -> Optional[str]:
+        """Рассылает файл подписчикам; возвращает file_id загруженного документа"""
+        # По индексу: подписчики, присоединившиеся во время отправки, тоже получат файл
+        i = 0
+        while i < len(job.subscribers):
+            sub = job.subscribers[i]
+            i += 1
+            try:
+                file_id = await self._send_document(job, sub.chat_id, excel_path, file_id)
+                await job.bot.send_message(sub.chat_id, "Админ-панель:", reply_markup=get_admin_menu())
+            except TelegramAPIError as e:
+                logger.error(f"❌ Export job #{job.id}: failed to send to {sub.chat_id}: {e}")
+            with suppress(TelegramAPIError):
+                await job.bot.delete_message(sub.chat_id, sub.message_id)
+        return file_id
+
+    async def _deliver_cached(self, job: ExportJob, entry: CachedExport) -> bool:
+        """False — файл записи уже вытеснен (а file_id нет или его не приняли): считаем промахом"""
+        try:
+            file_id = await self._deliver(job, entry.path, entry.file_id)
+        except FileNotFoundError:
+            export_cache.discard(job.request.key, entry.path)
+            return False
+
+        if file_id and file_id != entry.file_id:
+            export_cache.set_file_id(job.request.key, file_id)
+        logger.info(f"📦 Export {job.request.key}: served from cache ({entry.rows} rows)")
+        return True
+
+    @staticmethod
+    async def _send_document(job: ExportJob, chat_id: int, excel_path: str, file_id: Optional[str]) -> str:
+        """Уже загруженный документ — по file_id (без загрузки), иначе — с диска"""
+        request = job.request
+        if file_id:
+            try:
+                await job.bot.send_document(chat_id, document=file_id, caption=request.caption)
+                return file_id
+            except TelegramAPIError as e:
+                logger.warning(f"⚠️ Export job #{job.id}: file_id rejected ({e}), uploading from disk")
+
+        message = await job.bot.send_document(
+            chat_id, document=FSInputFile(excel_path, filename=request.filename), caption=request.caption
+        )
+        return message.document.file_id
+
+    async def _notify(self, job: ExportJob, text: str):
+        # По индексу, как в _deliver: подписавшиеся во время рассылки тоже получат ответ
+        i = 0
+        while i < len(job.subscribers):
+            sub = job.subscribers[i]
+            i += 1
+            with suppress(TelegramAPIError):
+                await job.bot.edit_message_text(
+                    text, chat_id=sub.chat_id, message_id=sub.message_id, reply_markup=get_admin_menu()
+                )
+
+
+export_jobs = ExportJobManager(
+    max_concurrent=getattr(config, "export_max_concurrent", 1),
+    queue_size=getattr(config, "export_queue_size", 10),
+)
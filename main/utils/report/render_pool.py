@@ -0,0 +1,73 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from utils.config.config import config
+from utils.logger.logger_config import logger
+
+
+class RenderPool:
+    """
+    Пул для тяжелой синхронной работы выгрузок (сборка .xlsx), чтобы она не занимала event loop.
+    По умолчанию — процессы (openpyxl держит GIL, поток тормозил бы и агентов);
+    если процессы недоступны или пул сломался — потоки.
+    Одновременно рендерится не больше max_workers файлов, остальные ждут на семафоре.
+    """
+
+    def __init__(self, max_workers: int = 1, use_processes: bool = True):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def kind(self) -> str:
+        return "process" if isinstance(self._executor, ProcessPoolExecutor) else "thread"
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                try:
+                    # spawn: дочерний процесс не наследует потоки aiosqlite и состояние loop
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                except (OSError, NotImplementedError, ValueError) as e:
+                    logger.warning(f"⚠️ Render pool: processes unavailable ({e}), falling back to threads")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """Выполняет fn(*args) в пуле; fn и аргументы должны быть picklable (уровень модуля)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+            except BrokenProcessPool as e:
+                # Воркер упал (OOM, kill) — дальше рендерим в потоках, этот файл пробуем еще раз
+                logger.error(f"❌ Render process pool broken ({e}), switching to threads")
+                self._switch_to_threads()
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def _switch_to_threads(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.use_processes = False
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool(
+    max_workers=getattr(config, "export_render_workers", 1),
+    use_processes=getattr(config, "export_render_processes", True),
+)